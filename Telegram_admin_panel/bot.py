@@ -1,11 +1,16 @@
 import os
 import asyncio
-from pyrogram import Client, filters
+import importlib.util
+from pyrogram import Client, filters, idle
 from pyrogram.types import Message, ForceReply, InlineKeyboardMarkup, InlineKeyboardButton
 import httpx
 import logging
 from dotenv import load_dotenv
 from schemas.user import RoleEnum
+from Telegram_admin_panel.credentials import CredCache
+from Telegram_admin_panel.dialogs import Dialog, DialogFlow
+from Telegram_admin_panel.search import SearchPager
+from Telegram_admin_panel.store import ExpiringStore
 
 load_dotenv()
 
@@ -14,6 +19,24 @@ API_HASH = os.getenv("TG_API_HASH")
 BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 BACKEND_URL = os.getenv("BACKEND_URL")
 SUPERADMIN_ID = int(os.getenv("SUPERADMIN_ID"))
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", 10))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", 5))
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", 20))
+# меньше таймаута простоя на стороне сервера (WEB_KEEPALIVE), иначе ловим закрытые соединения
+BACKEND_KEEPALIVE = float(os.getenv("BACKEND_KEEPALIVE", 55))
+# файл SQLite с сессиями и незавершёнными диалогами - переживают рестарт бота.
+# Секрет: в нём JWT админов (создаётся с правами 0600), в бэкапы и общие каталоги не класть
+BOT_STATE_PATH = os.getenv("BOT_STATE_PATH", "ufanet_bot.state.sqlite3")
+SESSION_TTL = float(os.getenv("SESSION_TTL", 30 * 24 * 3600))
+# сколько секунд ждём ответа на шаге диалога, потом диалог забывается
+DIALOG_TTL = float(os.getenv("DIALOG_TTL", 3600))
+# шаги входа короче: логин в контексте не должен висеть час
+LOGIN_STEP_TIMEOUT = float(os.getenv("LOGIN_STEP_TIMEOUT", 300))
+# записей на странице результатов поиска (больше 100 сервер не отдаёт - урезается до 100)
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 10))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", 10000))
+# сколько секунд доверяем проверенному токену без повторного /api/auth/me
+CRED_TTL = float(os.getenv("CRED_TTL", 60))
 
 # --- ЛОГИРОВАНИЕ ---
 logging.basicConfig(
@@ -22,11 +45,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-SESSIONS: dict[int, str] = {}
+# user_id -> токен
+sessions = ExpiringStore(BOT_STATE_PATH, "sessions", SESSION_TTL, STATE_MAX_ENTRIES)
+# проверенные токены и роли; 401 от бэкенда сбрасывает запись (хук на клиенте ниже)
+creds = CredCache(CRED_TTL)
 
 bot = Client("ufanet_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
 
-user_context: dict[int, dict[str, dict[str, str|list[int]|Message]]] = {}
+# один клиент на весь бот: соединения с бэкендом переиспользуются между обработчиками,
+# HTTP/2 - если установлен h2 (httpx[http2]). Закрывается вместе с ботом в main()
+backend = httpx.AsyncClient(
+    base_url=BACKEND_URL,
+    http2=importlib.util.find_spec("h2") is not None,
+    limits=httpx.Limits(
+        max_connections=BACKEND_MAX_CONNECTIONS,
+        max_keepalive_connections=BACKEND_MAX_CONNECTIONS,
+        keepalive_expiry=BACKEND_KEEPALIVE,
+    ),
+    timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT),
+    event_hooks={"response": [creds.drop_rejected]},
+)
+
+search_pager = SearchPager(backend, SEARCH_PAGE_SIZE)
+
+# user_id -> {"step": {"name": ...}, "ctx": {...}}; только JSON, сообщения - по message_id
+dialogs = ExpiringStore(BOT_STATE_PATH, "dialogs", DIALOG_TTL, STATE_MAX_ENTRIES)
+# шаги регистрируются ниже декоратором @flow.step
+flow = DialogFlow(dialogs)
 
 # --- ETC ---------------------------------------------------
 async def delete_later(msg: Message, delay: float = 1.0):
@@ -36,24 +81,80 @@ async def delete_later(msg: Message, delay: float = 1.0):
     except:
         pass
 
+async def delete_later_id(c: Client, chat_id: int, message_id: int | None, delay: float = 1.0):
+    if message_id is None:
+        return
+    await asyncio.sleep(delay)
+    try:
+        await c.delete_messages(chat_id, message_id)
+    except:
+        pass
+
+# --- SEARCH PAGES ----------------------------------------------
+def search_page_keyboard(search: dict) -> InlineKeyboardMarkup | None:
+    nav = []
+    if search["page"] > 0:
+        nav.append(InlineKeyboardButton("◀ Назад", callback_data="search_page:prev"))
+    if search["next"]:
+        nav.append(InlineKeyboardButton("Вперёд ▶", callback_data="search_page:next"))
+    return InlineKeyboardMarkup([nav]) if nav else None
+
+async def show_search(c: Client, d: Dialog, path: str, title: str, token: str):
+    """
+    Первая страница результатов отдельным сообщением с кнопками листания.
+    Состояние поиска (курсоры пройденных страниц) - в контексте диалога.
+    """
+    search = search_pager.new(path, title)
+    items = await search_pager.fetch(search, token)
+    if items:
+        msg = await c.send_message(
+            chat_id=d.user_id, text=search_pager.text(search, items), reply_markup=search_page_keyboard(search)
+        )
+    else:
+        msg = await c.send_message(chat_id=d.user_id, text="Ничего не найдено.")
+    d.ctx["search"] = search
+    d.ctx["msg_id"] = msg.id
+
+@ bot.on_callback_query(filters.regex("^search_page:(prev|next)$"))
+async def cb_search_page(c: Client, q):
+    resolved = flow.resolve(q.from_user.id)
+    d = resolved[0] if resolved else None
+    if d is None or "search" not in d.ctx or d.ctx.get("msg_id") != q.message.id:
+        await q.answer("Поиск устарел, начните заново.")
+        return
+    token = await check_cred(q)
+    if not token:
+        return
+    search = d.ctx["search"]
+    items = await search_pager.turn(search, q.data.endswith("next"), token)
+    if items is None:
+        await q.answer()
+        return
+    d.save()
+    if not items:
+        # дальше пусто - остаёмся на текущей странице, убираем кнопку «Вперёд»
+        await q.message.edit_reply_markup(search_page_keyboard(search))
+        await q.answer("Больше ничего нет.")
+        return
+    await q.message.edit_text(search_pager.text(search, items), reply_markup=search_page_keyboard(search))
+    await q.answer()
+
+async def get_role(user_id: int, token: str) -> str | None:
+    return await creds.get_role(backend, user_id, token)
+
 async def check_cred(message: Message) -> str | None:
     user_id = message.from_user.id
-    token = SESSIONS.get(user_id)
-    if token:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{BACKEND_URL}/api/auth/me",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            if resp.status_code != 200: token = None
+    token = sessions.get(user_id)
+    if token and await get_role(user_id, token) is None:
+        token = None
     if not token:
         try:
             await message.answer("Сначала войдите командой /login", show_alert=True)
-            SESSIONS.pop(message.from_user.id, None)
+            sessions.pop(message.from_user.id)
             return None
         except:
             await message.reply("Сначала войдите командой /login")
-            SESSIONS.pop(message.from_user.id, None)
+            sessions.pop(message.from_user.id)
             return None
     return token
 
@@ -69,41 +170,35 @@ async def start(client: Client, m: Message):
         [InlineKeyboardButton("Добавить связь предложения с городом", callback_data="add_link_offer_city$")],
         [InlineKeyboardButton("Выйти", callback_data="logout")],
     ]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{BACKEND_URL}/api/auth/me",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        if resp.json().get("role") == RoleEnum.superadmin:
-            reply_markup.extend([[InlineKeyboardButton("Создать админа", callback_data="create_admin")],
-                                 [InlineKeyboardButton("Удалить связь предложения с городом",
-                                                       callback_data="delete_link_offer_city$")],
-                                 [InlineKeyboardButton("Удалить предложение", callback_data="delete_offer")],
-                                 [InlineKeyboardButton("Удалить категорию", callback_data="delete_category")],
-                                 [InlineKeyboardButton("Удалить город", callback_data="delete_city")]])
+    if await get_role(m.from_user.id, token) == RoleEnum.superadmin:
+        reply_markup.extend([[InlineKeyboardButton("Создать админа", callback_data="create_admin")],
+                             [InlineKeyboardButton("Удалить связь предложения с городом",
+                                                   callback_data="delete_link_offer_city$")],
+                             [InlineKeyboardButton("Удалить предложение", callback_data="delete_offer")],
+                             [InlineKeyboardButton("Удалить категорию", callback_data="delete_category")],
+                             [InlineKeyboardButton("Удалить город", callback_data="delete_city")]])
     await m.reply("Вы вошли успешно.", reply_markup=InlineKeyboardMarkup(reply_markup))
 # --- SUPERADMIN: CREATE ADMIN ----------------------------------
 @ bot.on_callback_query(filters.private & filters.user(SUPERADMIN_ID) & filters.regex("^create_admin$"))
 async def cmd_create_admin(c: Client, m: Message):
-    global user_context
     user_id = m.from_user.id
     if not await check_cred(m):
         return
-    user_context[user_id] = {"step": {"name": "create_admin_login"}, "ctx": {}}
+    flow.begin(user_id, "create_admin_login")
     await m.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите логин нового администратора:", reply_markup=ForceReply(True))
 
 # --- ADMIN: LOGIN ------------------------------------------------
 @ bot.on_message(filters.private & filters.command("login"))
 async def cmd_login(c: Client, m: Message):
-    global user_context
     user_id = m.from_user.id
-    user_context[user_id] = {"step": {"name": "login_login"}, "ctx": {}}
+    flow.begin(user_id, "login_login")
     await m.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите ваш логин:", reply_markup=ForceReply(True))
 
 # --- LOGOUT -------------------------------------------------------
 @ bot.on_callback_query(filters.regex("^logout$"))
 async def logout(c: Client, q):
-    SESSIONS.pop(q.from_user.id, None)
+    sessions.pop(q.from_user.id)
+    creds.pop(q.from_user.id)
     await q.answer("Вы вышли.")
     await q.message.delete()
 
@@ -114,7 +209,7 @@ async def cb_create_offer(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок предложения:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "create_offer_title"}, "ctx": {}}
+    flow.begin(user_id, "create_offer_title")
 
 # --- DEL OFFER FLOW ----------------------------------------------
 @ bot.on_callback_query(filters.regex("^delete_offer$") & filters.user(SUPERADMIN_ID))
@@ -123,7 +218,7 @@ async def cb_delete_offer(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок предложения:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "delete_offer_title"}, "ctx": {}}
+    flow.begin(user_id, "delete_offer_title")
 
 # --- DEL OFFER LINK CITY FLOW ----------------------------------------------
 @ bot.on_callback_query(filters.regex("^delete_link_offer_city$") & filters.user(SUPERADMIN_ID))
@@ -132,7 +227,7 @@ async def cb_delete_offer_link_city(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок предложения:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "change_link_offer_title"}, "ctx": {"func_name": "delete"}}
+    flow.begin(user_id, "change_link_offer_title", func_name="delete")
 
 # --- ADD OFFER LINK CITY FLOW ----------------------------------------------
 @ bot.on_callback_query(filters.regex("^add_link_offer_city$"))
@@ -141,7 +236,7 @@ async def cb_add_offer_link_city(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок предложения:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "change_link_offer_title"}, "ctx": {"ctx": {"func_name": "add"}}}
+    flow.begin(user_id, "change_link_offer_title", func_name="add")
 
 
 # --- ADD category FLOW ----------------------------------------------
@@ -151,7 +246,7 @@ async def cb_create_category(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок категории:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "create_category_title"}, "ctx": {}}
+    flow.begin(user_id, "create_category_title")
 
 # --- DEL category FLOW ----------------------------------------------
 @ bot.on_callback_query(filters.regex("^delete_category$") & filters.user(SUPERADMIN_ID))
@@ -160,7 +255,7 @@ async def cb_delete_category(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите заголовок категории:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "delete_category_title"}, "ctx": {}}
+    flow.begin(user_id, "delete_category_title")
 
 
 # --- ADD cities FLOW ----------------------------------------------
@@ -170,7 +265,7 @@ async def cb_create_city(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите название города:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "create_city_title"}, "ctx": {}}
+    flow.begin(user_id, "create_city_title")
 
 # --- DEL cities FLOW ----------------------------------------------
 @ bot.on_callback_query(filters.regex("^delete_city$") & filters.user(SUPERADMIN_ID))
@@ -179,325 +274,338 @@ async def cb_create_city(c: Client, q):
     if not await check_cred(q):
         return
     await q.message.reply("Чтобы прервать на любом этапе напишите 'abort'\nВведите название города:", reply_markup=ForceReply(True))
-    user_context[user_id] = {"step": {"name": "delete_city_title"}, "ctx": {}}
+    flow.begin(user_id, "delete_city_title")
+
+
+# --- DIALOG STEPS ----------------------------------------------
+@flow.step("create_admin_login")
+async def create_admin_login(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["login"] = text
+    await m.reply("Введите пароль для нового администратора:", reply_markup=ForceReply(True))
+    d.goto("create_admin_pass")
+    await delete_later(m)
+
+
+@flow.step("create_admin_pass")
+async def create_admin_pass(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    login = d.ctx.get("login")
+    resp = await backend.post("/api/auth/signup",
+                              json={
+                                  "username": login,
+                                  "password": text
+                              },
+                              headers={"Authorization": f"Bearer {token}"})
+    await delete_later(m)
+    if resp.status_code == 201:
+        await m.reply(f"Администратор {resp.text} успешно создан.")
+    else:
+        await m.reply(f"Ошибка при создании: {resp.text}")
+    d.finish()
+
+
+@flow.step("login_login", timeout=LOGIN_STEP_TIMEOUT, public=True)
+async def login_login(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["login"] = text
+    await m.reply("Введите ваш пароль:", reply_markup=ForceReply(True))
+    d.goto("login_pass")
+    await delete_later(m)
+
+
+@flow.step("login_pass", timeout=LOGIN_STEP_TIMEOUT, public=True)
+async def login_pass(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    login = d.ctx["login"]
+    resp = await backend.post("/api/auth/token",
+                              data={"grant_type": "password", "username": login, "password": text},
+                              headers={"Content-Type": "application/x-www-form-urlencoded"})
+    await delete_later(m)
+    if resp.status_code == 200:
+        token = resp.json().get("access_token")
+        sessions.set(m.from_user.id, token)
+        reply_markup = [
+            [InlineKeyboardButton("Добавить предложение", callback_data="create_offer")],
+            [InlineKeyboardButton("Добавить город", callback_data="create_city")],
+            [InlineKeyboardButton("Добавить категорию", callback_data="create_category")],
+            [InlineKeyboardButton("Добавить связь предложения с городом", callback_data="add_link_offer_city$")],
+            [InlineKeyboardButton("Выйти", callback_data="logout")],
+        ]
+        if await get_role(m.from_user.id, token) == RoleEnum.superadmin:
+            reply_markup.extend([[InlineKeyboardButton("Создать админа", callback_data="create_admin")],
+                                 [InlineKeyboardButton("Удалить связь предложения с городом", callback_data="delete_link_offer_city$")],
+                                 [InlineKeyboardButton("Удалить предложение", callback_data="delete_offer")],
+                                 [InlineKeyboardButton("Удалить категорию", callback_data="delete_category")],
+                                 [InlineKeyboardButton("Удалить город", callback_data="delete_city")]])
+        await m.reply("Вы вошли успешно.", reply_markup=InlineKeyboardMarkup(reply_markup))
+    else:
+        await m.reply("Неверный логин или пароль.")
+    d.finish()
+
+
+@flow.step("create_offer_title")
+async def create_offer_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["title"] = text
+    await m.reply("Введите описание:", reply_markup=ForceReply(True))
+    d.goto("create_offer_description")
+    await delete_later(m)
+
+
+@flow.step("create_offer_description")
+async def create_offer_description(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["description"] = text
+    await m.reply("Введите прямую ссылку на изображение для вона карточки:",
+                        reply_markup=ForceReply(True))
+    d.goto("create_offer_BackURL")
+    await delete_later(m)
+
+
+@flow.step("create_offer_BackURL")
+async def create_offer_BackURL(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["BackURL"] = text
+    await m.reply("Введите прямую ссылку на изображение логотипа:", reply_markup=ForceReply(True))
+    d.goto("create_offer_LogoURL")
+    await delete_later(m)
+
+
+@flow.step("create_offer_LogoURL")
+async def create_offer_LogoURL(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["LogoURL"] = text
+    await m.reply("Введите Название компании:", reply_markup=ForceReply(True))
+    d.goto("create_offer_company")
+    await delete_later(m)
+
+
+@flow.step("create_offer_company")
+async def create_offer_company(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["company"] = text
+    await m.reply("Введите ID городов через запятую:", reply_markup=ForceReply(True))
+    d.goto("create_offer_cities")
+    await delete_later(m)
+
+
+@flow.step("create_offer_cities")
+async def create_offer_cities(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["city_ids"] = [int(x) for x in text.split(",") if x.strip().isdigit()]
+    await m.reply("Введите ID категорий (до 2) через запятую:", reply_markup=ForceReply(True))
+    d.goto("create_offer_categories")
+    await delete_later(m)
+
+
+@flow.step("create_offer_categories")
+async def create_offer_categories(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    category_ids = [int(x) for x in text.split(",") if x.strip().isdigit()]
+    ctx = d.ctx
+    if len(category_ids) > 2:
+        await m.reply(f"Ошибка: ID категорий больше двух")
+        await delete_later(m)
+        return
+    resp = await backend.post(
+        "/api/offers/",
+        json={
+            "title": ctx["title"],
+            "description": ctx["description"],
+            "backgroundImageUrl": ctx["BackURL"],
+            "companyLogoUrl": ctx["LogoURL"],
+            "companyName": ctx["company"],
+            "cityIds": ctx["city_ids"],
+            "categoryIds": category_ids
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
+    await delete_later(m)
+    d.finish()
+
+
+@flow.step("delete_offer_title")
+async def delete_offer_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    title_delete = text
+    await show_search(c, d, "/api/offers/search", title_delete, token)
+    await m.reply("Введите id нужного предложения для удаления:", reply_markup=ForceReply(True))
+    d.goto("delete_offer_id")
+    await delete_later(m)
+
+
+@flow.step("delete_offer_id")
+async def delete_offer_id(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    id_delete = text
+    await delete_later_id(c, d.user_id, d.ctx.get("msg_id"))
+    resp = await backend.delete(
+        f"/api/offers/{id_delete}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await m.reply(f"изменено: {resp}")
+    d.finish()
+    await delete_later(m)
+
+
+@flow.step("change_link_offer_title")
+async def change_link_offer_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    title_offer_delete = text
+    await show_search(c, d, "/api/offers/search", title_offer_delete, token)
+    await m.reply("Введите id нужного предложения для изменения связи:", reply_markup=ForceReply(True))
+    d.goto("change_link_offer_id")
+    await delete_later(m)
+
+
+@flow.step("change_link_offer_id")
+async def change_link_offer_id(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    id_offer_delete = text
+    await delete_later_id(c, d.user_id, d.ctx.get("msg_id"))
+    await m.reply("Введите заголовок нужного города для изменения связи:", reply_markup=ForceReply(True))
+    d.ctx["id_offer"] = id_offer_delete
+    d.goto("change_link_city_title")
+    await delete_later(m)
+
+
+@flow.step("change_link_city_title")
+async def change_link_city_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    title_city_delete = text
+    await show_search(c, d, "/api/cities/search", title_city_delete, token)
+    await m.reply("Введите id нужного города для изменения связи:", reply_markup=ForceReply(True))
+    d.goto("change_link_city_id")
+    await delete_later(m)
+
+
+@flow.step("change_link_city_id")
+async def change_link_city_id(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    id_city = text
+    id_offer = d.ctx.get("id_offer")
+    func_name = d.ctx.get("func_name")
+    await delete_later_id(c, d.user_id, d.ctx.get("msg_id"))
+    if func_name == "delete":
+        resp = await backend.delete(
+            f"/api/offer/{id_offer}/cities/{id_city}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    else:
+        # добавляем
+        resp = await backend.post(
+            f"/api/offer/{id_offer}/cities/{id_city}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    await m.reply(f"Изменено: {resp}")
+    d.finish()
+    await delete_later(m)
+
+
+@flow.step("create_category_title")
+async def create_category_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    d.ctx["category_title"] = text
+    await m.reply("Введите прямую ссылку на изображение для вона категории:",
+                        reply_markup=ForceReply(True))
+    d.goto("create_category_BackURL")
+    await delete_later(m)
+
+
+@flow.step("create_category_BackURL")
+async def create_category_BackURL(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    backurl = text
+    ctx = d.ctx
+    resp = await backend.post(
+        "/api/categories/",
+        json={
+            "name": ctx["category_title"],
+            "image_url": backurl,
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
+    await delete_later(m)
+    d.finish()
+
+
+@flow.step("delete_category_title")
+async def delete_category_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    title_delete = text
+    await show_search(c, d, "/api/categories/search", title_delete, token)
+    await m.reply("Введите id нужной категории для удаления:",
+                        reply_markup=ForceReply(True))
+    d.goto("delete_category_id")
+    await delete_later(m)
+
+
+@flow.step("delete_category_id")
+async def delete_category_id(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    id_delete = text
+    await delete_later_id(c, d.user_id, d.ctx.get("msg_id"))
+    resp = await backend.delete(
+        f"/api/categories/{id_delete}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await c.send_message(chat_id=d.user_id, text=resp.json())
+    await m.reply(f"изменено {resp}")
+    d.finish()
+    await delete_later(m)
+
+
+@flow.step("create_city_title")
+async def create_city_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    resp = await backend.post(
+        "/api/cities/",
+        json={
+            "name": text,
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
+    await delete_later(m)
+    d.finish()
+
+
+@flow.step("delete_city_title")
+async def delete_city_title(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    title_delete = text
+    await show_search(c, d, "/api/cities/search", title_delete, token)
+    d.goto("delete_city_id")
+    await m.reply("Введите id нужного города для удаления:",
+                  reply_markup=ForceReply(True))
+    await delete_later(m)
+
+
+@flow.step("delete_city_id")
+async def delete_city_id(c: Client, m: Message, d: Dialog, text: str, token: str | None):
+    id_delete = text
+    await delete_later_id(c, d.user_id, d.ctx.get("msg_id"))
+    resp = await backend.delete(
+        f"/api/cities/{id_delete}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await m.reply(f"Изменено: {resp}")
+    d.finish()
+    await delete_later(m)
 
 
 # --- GLOBAL reply_handler ----------------------------------------------
 @ bot.on_message(filters.reply & filters.private)
 async def reply_handler(c: Client, m: Message):
-    global user_context
-    user_id = m.from_user.id
-    token = await check_cred(m)
-    if not token:
+    resolved = flow.resolve(m.from_user.id)
+    if resolved is None:
         return
-    if user_context.get(user_id):
-        if not user_context.get(user_id).get("step"):
-            return
-        if user_context.get(user_id).get("ctx") is None:
-            return
-        text = m.text.strip()
-        if not text:
-            return
-        if "abort" in text:
-            await m.reply("Прервано пользователем")
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_admin_login":
-            user_context[user_id]["ctx"]["login"] = text
-            await m.reply("Введите пароль для нового администратора:", reply_markup=ForceReply(True))
-            await delete_later(m)
-            user_context[user_id]["step"]["name"] = "create_admin_pass"
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_admin_pass":
-            login = user_context[user_id]["ctx"].get("login")
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{BACKEND_URL}/api/auth/signup",
-                                         json={
-                                             "username": login,
-                                             "password": text
-                                         },
-                                         headers={"Authorization": f"Bearer {token}"})
-            await delete_later(m)
-            if resp.status_code == 201:
-                await m.reply(f"Администратор {resp.text} успешно создан.")
-            else:
-                await m.reply(f"Ошибка при создании: {resp.text}")
-            del user_context[user_id]
-            return
-        if user_context.get(user_id).get("step").get("name") == "login_login":
-            user_context[user_id]["ctx"]["login"] = text
-            await m.reply("Введите ваш пароль:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "login_pass"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "login_pass":
-            login = user_context[user_id]["ctx"]["login"]
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{BACKEND_URL}/api/auth/token",
-                                         data={"grant_type": "password", "username": login, "password": text},
-                                         headers={"Content-Type": "application/x-www-form-urlencoded"})
-            await delete_later(m)
-            if resp.status_code == 200:
-                token = resp.json().get("access_token")
-                SESSIONS[m.from_user.id] = token
-                reply_markup = [
-                    [InlineKeyboardButton("Добавить предложение", callback_data="create_offer")],
-                    [InlineKeyboardButton("Добавить город", callback_data="create_city")],
-                    [InlineKeyboardButton("Добавить категорию", callback_data="create_category")],
-                    [InlineKeyboardButton("Добавить связь предложения с городом", callback_data="add_link_offer_city$")],
-                    [InlineKeyboardButton("Выйти", callback_data="logout")],
-                ]
-                async with httpx.AsyncClient() as client:
-                    resp = await client.get(
-                        f"{BACKEND_URL}/api/auth/me",
-                        headers={"Authorization": f"Bearer {token}"}
-                    )
-                    if resp.json().get("role") == RoleEnum.superadmin:
-                        reply_markup.extend([[InlineKeyboardButton("Создать админа", callback_data="create_admin")],
-                                             [InlineKeyboardButton("Удалить связь предложения с городом", callback_data="delete_link_offer_city$")],
-                                             [InlineKeyboardButton("Удалить предложение", callback_data="delete_offer")],
-                                             [InlineKeyboardButton("Удалить категорию", callback_data="delete_category")],
-                                             [InlineKeyboardButton("Удалить город", callback_data="delete_city")]])
-                await m.reply("Вы вошли успешно.", reply_markup=InlineKeyboardMarkup(reply_markup))
-            else:
-                await m.reply("Неверный логин или пароль.")
-            del user_context[user_id]
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_title":
-            user_context[user_id]["ctx"]["title"] = text
-            await m.reply("Введите описание:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_description"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_description":
-            user_context[user_id]["ctx"]["description"] = text
-            await m.reply("Введите прямую ссылку на изображение для вона карточки:",
-                                reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_BackURL"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_BackURL":
-            user_context[user_id]["ctx"]["BackURL"] = text
-            await m.reply("Введите прямую ссылку на изображение логотипа:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_LogoURL"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_LogoURL":
-            user_context[user_id]["ctx"]["LogoURL"] = text
-            await m.reply("Введите Название компании:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_company"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_company":
-            user_context[user_id]["ctx"]["company"] = text
-            await m.reply("Введите ID городов через запятую:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_cities"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_cities":
-            user_context[user_id]["ctx"]["city_ids"] = [int(x) for x in text.split(",") if x.strip().isdigit()]
-            await m.reply("Введите ID категорий (до 2) через запятую:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_offer_categories"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_offer_categories":
-            category_ids = [int(x) for x in text.split(",") if x.strip().isdigit()]
-            ctx = user_context[user_id].get("ctx")
-            if len(category_ids) > 2:
-                await m.reply(f"Ошибка: ID категорий больше двух")
-                await delete_later(m)
-                return
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f"{BACKEND_URL}/api/offers/",
-                    json={
-                        "title": ctx["title"],
-                        "description": ctx["description"],
-                        "backgroundImageUrl": ctx["BackURL"],
-                        "companyLogoUrl": ctx["LogoURL"],
-                        "companyName": ctx["company"],
-                        "cityIds": ctx["city_ids"],
-                        "categoryIds": category_ids
-                    },
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
-            await delete_later(m)
-            del user_context[user_id]
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_offer_title":
-            title_delete = text
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(
-                    f"{BACKEND_URL}/api/offers/search",
-                    params={"title": title_delete},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            msg = await c.send_message(chat_id=user_id, text=resp.json())
-            await m.reply("Введите id нужного предложения для удаления:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "delete_offer_id"
-            user_context[user_id]["ctx"]["msg"] = msg
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_offer_id":
-            id_delete = text
-            await delete_later(user_context[user_id]["ctx"].get("msg"))
-            async with httpx.AsyncClient() as client:
-                resp = await client.delete(
-                    f"{BACKEND_URL}/api/offers/{id_delete}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await m.reply(f"изменено: {resp}")
-            del user_context[user_id]
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "change_link_offer_title":
-            title_offer_delete = text
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(
-                    f"{BACKEND_URL}/api/offers/search",
-                    params={"title": title_offer_delete},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            msg = await c.send_message(chat_id=user_id, text=resp.json())
-            await m.reply("Введите id нужного предложения для изменения связи:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "change_link_offer_id"
-            user_context[user_id]["ctx"]["msg"] = msg
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "change_link_offer_id":
-            id_offer_delete = text
-            await delete_later(user_context[user_id]["ctx"].get("msg"))
-            await m.reply("Введите заголовок нужного города для изменения связи:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "change_link_city_title"
-            user_context[user_id]["ctx"]["id_offer"] = id_offer_delete
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "change_link_city_title":
-            title_city_delete = text
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(
-                    f"{BACKEND_URL}/api/cities/search",
-                    params={"title": title_city_delete},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            msg = await c.send_message(chat_id=user_id, text=resp.json())
-            await m.reply("Введите id нужного города для изменения связи:", reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "change_link_city_id"
-            user_context[user_id]["ctx"]["msg"] = msg
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "change_link_city_id":
-            id_city = text
-            id_offer = user_context[user_id]["ctx"].get("id_offer")
-            func_name = user_context[user_id]["ctx"].get("func_name")
-            await delete_later(user_context[user_id]["ctx"].get("msg"))
-            async with httpx.AsyncClient() as client:
-                if func_name == "delete":
-                    resp = await client.delete(
-                        f"{BACKEND_URL}/api/offer/{id_offer}/cities/{id_city}",
-                        headers={"Authorization": f"Bearer {token}"}
-                    )
-                else:
-                    # добавляем
-                    resp = await client.post(
-                        f"{BACKEND_URL}/api/offer/{id_offer}/cities/{id_city}",
-                        headers={"Authorization": f"Bearer {token}"}
-                    )
-            await m.reply(f"Изменено: {resp}")
-            del user_context[user_id]
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_category_title":
-            user_context[user_id]["ctx"]["category_title"] = text
-            await m.reply("Введите прямую ссылку на изображение для вона категории:",
-                                reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "create_category_BackURL"
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_category_BackURL":
-            backurl = text
-            ctx = user_context[user_id].get("ctx")
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f"{BACKEND_URL}/api/categories/",
-                    json={
-                        "name": ctx["category_title"],
-                        "image_url": backurl,
-                    },
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
-            await delete_later(m)
-            del user_context[user_id]
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_category_title":
-            title_delete = text
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(
-                    f"{BACKEND_URL}/api/categories/search",
-                    params={"title": title_delete},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            msg = await c.send_message(chat_id=user_id, text=resp.json())
-            await m.reply("Введите id нужной категории для удаления:",
-                                reply_markup=ForceReply(True))
-            user_context[user_id]["step"]["name"] = "delete_category_id"
-            user_context[user_id]["ctx"]["msg"] = msg
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_category_id":
-            id_delete = text
-            await delete_later(user_context[user_id]["ctx"].get("msg"))
-            async with httpx.AsyncClient() as client:
-                resp = await client.delete(
-                    f"{BACKEND_URL}/api/categories/{id_delete}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await c.send_message(chat_id=user_id, text=resp.json())
-            await m.reply(f"изменено {resp}")
-            del user_context[user_id]
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "create_city_title":
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f"{BACKEND_URL}/api/cities/",
-                    json={
-                        "name": text,
-                    },
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await m.reply("Успешно создано." if resp.status_code == 201 else f"Ошибка: {resp.text}")
-            await delete_later(m)
-            del user_context[user_id]
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_city_title":
-            title_delete = text
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(
-                    f"{BACKEND_URL}/api/cities/search",
-                    params={"title": title_delete},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            msg = await c.send_message(chat_id=user_id, text=resp.json())
-            user_context[user_id]["step"]["name"] = "delete_city_id"
-            user_context[user_id]["ctx"]["msg"] = msg
-            await m.reply("Введите id нужного города для удаления:",
-                          reply_markup=ForceReply(True))
-            await delete_later(m)
-            return
-        if user_context.get(user_id).get("step").get("name") == "delete_city_id":
-            id_delete = text
-            await delete_later(user_context[user_id]["ctx"].get("msg"))
-            async with httpx.AsyncClient() as client:
-                resp = await client.delete(
-                    f"{BACKEND_URL}/api/cities/{id_delete}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-            await m.reply(f"Изменено: {resp}")
-            await delete_later(m)
+    dialog, step = resolved
+    token = None
+    if not step.public:
+        token = await check_cred(m)
+        if not token:
             return
+    text = (m.text or "").strip()
+    if not text:
+        return
+    if "abort" in text:
+        dialog.finish()
+        await m.reply("Прервано пользователем")
+        return
+    await step.handler(c, m, dialog, text, token)
+
+
+async def main():
+    try:
+        async with backend:
+            async with bot:
+                await idle()
+    finally:
+        sessions.close()
+        dialogs.close()
+
 
 if __name__ == "__main__":
-    bot.run()
+    bot.run(main())
 
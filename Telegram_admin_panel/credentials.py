@@ -0,0 +1,47 @@
+import time
+
+import httpx
+
+
+class CredCache:
+    """
+    Проверенные токены: user_id -> (токен, роль, момент истечения по
+    time.monotonic()). Ответ /api/auth/me доверяется на ttl секунд; любой
+    401 от бэкенда (хук drop_rejected на клиенте) сбрасывает запись раньше.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: dict[int, tuple[str, str, float]] = {}
+
+    async def drop_rejected(self, response: httpx.Response):
+        # любой 401 от бэкенда - токен больше не действует, следующая проверка пойдёт в /api/auth/me
+        if response.status_code != 401:
+            return
+        auth = response.request.headers.get("Authorization")
+        if not auth:
+            return
+        for user_id, (token, _, _) in list(self._entries.items()):
+            if auth == f"Bearer {token}":
+                self._entries.pop(user_id, None)
+
+    async def get_role(self, backend: httpx.AsyncClient, user_id: int, token: str) -> str | None:
+        """
+        Роль владельца токена или None, если токен не принят.
+        """
+        cached = self._entries.get(user_id)
+        now = time.monotonic()
+        if cached and cached[0] == token and cached[2] > now:
+            return cached[1]
+        resp = await backend.get(
+            "/api/auth/me",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        if resp.status_code != 200:
+            self._entries.pop(user_id, None)
+            return None
+        role = resp.json().get("role")
+        self._entries[user_id] = (token, role, now + self.ttl)
+        return role
+
+    def pop(self, user_id: int):
+        self._entries.pop(user_id, None)
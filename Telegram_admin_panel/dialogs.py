@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from Telegram_admin_panel.store import ExpiringStore
+
+
+@dataclass(slots=True)
+class Step:
+    handler: Callable[..., Awaitable[None]]
+    # сколько секунд ждём ответа на этом шаге; по истечении диалог удаляется из хранилища
+    timeout: float
+    # шаг доступен без входа (сам вход)
+    public: bool = False
+
+
+class Dialog:
+    """
+    Текущий диалог пользователя: имя шага и собранные данные (только JSON).
+    """
+    __slots__ = ("flow", "user_id", "step", "ctx")
+
+    def __init__(self, flow: "DialogFlow", user_id: int, step: str, ctx: dict):
+        self.flow = flow
+        self.user_id = user_id
+        self.step = step
+        self.ctx = ctx
+
+    def goto(self, step: str):
+        self.step = step
+        self.flow.save(self)
+
+    def save(self):
+        # данные изменились, шаг тот же - таймаут шага отсчитывается заново
+        self.flow.save(self)
+
+    def finish(self):
+        self.flow.store.pop(self.user_id)
+
+
+class DialogFlow:
+    """
+    Конечный автомат диалогов бота: имя шага -> обработчик в таблице,
+    заполняемой декоратором step(). На сообщение - одно чтение состояния и
+    один поиск в словаре, сколько бы сценариев ни было зарегистрировано.
+    Таймаут шага - срок жизни записи в хранилище: не ответил вовремя -
+    диалог забыт.
+    """
+    def __init__(self, store: ExpiringStore):
+        self.store = store
+        self.steps: dict[str, Step] = {}
+
+    def step(self, name: str, timeout: float | None = None, public: bool = False):
+        def decorator(handler):
+            self.steps[name] = Step(handler, self.store.ttl if timeout is None else timeout, public)
+            return handler
+        return decorator
+
+    def begin(self, user_id: int, step: str, **ctx) -> Dialog:
+        dialog = Dialog(self, user_id, step, ctx)
+        self.save(dialog)
+        return dialog
+
+    def save(self, dialog: Dialog):
+        # KeyError на незарегистрированном шаге - опечатка в имени
+        timeout = self.steps[dialog.step].timeout
+        self.store.set(dialog.user_id, {"step": {"name": dialog.step}, "ctx": dialog.ctx}, ttl=timeout)
+
+    def resolve(self, user_id: int) -> tuple[Dialog, Step] | None:
+        state = self.store.get(user_id)
+        if not state:
+            return None
+        step = self.steps.get(state["step"]["name"])
+        if step is None:
+            # шаг убран из бота после сохранения состояния
+            self.store.pop(user_id)
+            return None
+        return Dialog(self, user_id, state["step"]["name"], state["ctx"]), step
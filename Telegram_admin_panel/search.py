@@ -0,0 +1,73 @@
+import httpx
+
+# сервер принимает limit не больше 100 (db.crud.SEARCH_LIMIT_MAX), больше - 422
+SEARCH_LIMIT_MAX = 100
+# страница должна влезть в сообщение (4096 символов) с запасом
+MESSAGE_MAX = 3800
+# строка поиска в заголовке страницы - от пользователя, длина любая
+SEARCH_TITLE_MAX = 200
+
+
+class SearchPager:
+    """
+    Листание результатов поиска бэкенда по keyset-курсорам. Состояние поиска -
+    словарь (только JSON, хранится в контексте диалога): путь, строка поиска,
+    курсоры пройденных страниц, номер текущей и курсор следующей из
+    x-next-cursor.
+    """
+    def __init__(self, backend: httpx.AsyncClient, page_size: int):
+        self.backend = backend
+        self.page_size = max(1, min(page_size, SEARCH_LIMIT_MAX))
+        # длинные заголовки записей обрезаются, чтобы страница влезла в сообщение
+        self.label_max = (MESSAGE_MAX - SEARCH_TITLE_MAX) // self.page_size - 16
+
+    @staticmethod
+    def new(path: str, title: str) -> dict:
+        return {"path": path, "title": title, "cursors": [None], "page": 0, "next": None}
+
+    def text(self, search: dict, items: list[dict]) -> str:
+        lines = [f"Найдено по «{search['title'][:SEARCH_TITLE_MAX]}», страница {search['page'] + 1}:"]
+        for item in items:
+            label = item.get("title") or item.get("name") or ""
+            lines.append(f"{item['id']} — {label[:self.label_max]}")
+        return "\n".join(lines)
+
+    async def fetch(self, search: dict, token: str) -> list[dict]:
+        """
+        Страница поиска - не больше page_size записей, начиная с курсора
+        search["cursors"][search["page"]]. Курсор следующей страницы сервер
+        отдаёт в x-next-cursor, он сохраняется в search["next"].
+        """
+        params = {"title": search["title"], "limit": self.page_size}
+        after = search["cursors"][search["page"]]
+        if after:
+            params["after"] = after
+        resp = await self.backend.get(search["path"], params=params, headers={"Authorization": f"Bearer {token}"})
+        if resp.status_code != 200:
+            search["next"] = None
+            return []
+        search["next"] = resp.headers.get("x-next-cursor")
+        return resp.json()
+
+    async def turn(self, search: dict, forward: bool, token: str) -> list[dict] | None:
+        """
+        Переход на соседнюю страницу. None - переходить некуда (состояние не
+        менялось), [] - страница оказалась пустой (записи удалили между
+        запросами), поиск остаётся на текущей странице без кнопки вперёд.
+        """
+        page = search["page"]
+        if forward:
+            if not search["next"]:
+                return None
+            del search["cursors"][page + 1:]
+            search["cursors"].append(search["next"])
+            search["page"] = page + 1
+        else:
+            if page == 0:
+                return None
+            search["page"] = page - 1
+        items = await self.fetch(search, token)
+        if not items:
+            search["page"] = page
+            del search["cursors"][page + 1:]
+        return items
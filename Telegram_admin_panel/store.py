@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import time
+
+
+class ExpiringStore:
+    """
+    Словарь user_id -> JSON-значение в файле SQLite. У записи срок жизни ttl
+    (или свой, переданный в set) от последней записи, записей не больше
+    max_entries: при переполнении вытесняются ближайшие к истечению. В памяти
+    процесса ничего не держится, поэтому после рестарта бот продолжает с того
+    же места.
+    Значение должно сериализоваться в JSON - объекты pyrogram сюда не попадут.
+    В файле лежат токены админов: он доступен только владельцу процесса (0600),
+    журналы -wal/-shm SQLite создаёт с теми же правами.
+    """
+    def __init__(self, path: str, table: str, ttl: float, max_entries: int):
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+            # файл мог остаться от версии без этой проверки
+            os.chmod(path, 0o600)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(key INTEGER PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+        self._purge()
+
+    def get(self, key: int):
+        row = self._db.execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: int, value, ttl: float | None = None):
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time() + (self.ttl if ttl is None else ttl)),
+        )
+        self._purge()
+
+    def pop(self, key: int):
+        self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self) -> int:
+        return self._db.execute(
+            f"SELECT count(*) FROM {self.table} WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    def _purge(self):
+        self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE key IN "
+            f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,141 @@
+"""
+Микробенчмарки CPU-путей одного запроса, без БД: сериализация OfferRead,
+выпуск и проверка JWT, bcrypt (passlib, наши rounds), разбор события Kafka.
+
+Каждый замер: timeit.autorange подбирает число вызовов на прогон (не меньше
+0.2 с), затем REPEAT прогонов; в отчёте медиана, минимум и разброс
+(stdev/медиана) времени одного вызова. Медиана сравнивается с сохранённым
+базовым значением; рост больше допуска - регрессия (код возврата 1).
+
+    python -m benchmarks.bench_hotpaths                 # сравнить с базой
+    python -m benchmarks.bench_hotpaths --save          # перезаписать базу
+    python -m benchmarks.bench_hotpaths --only token
+
+База зависит от машины: обновлять на той же, где сравнивают (CI-раннер).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from core.events import decode_event
+from core.security import create_access_token, decode_access_token, pwd_context, get_password_hash, verify_password
+from db.models import Offer
+from schemas.offer import OfferRead
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "bench_hotpaths.json")
+REPEAT = 7
+# допуск по умолчанию; если собственный разброс замера больше - берём 3 разброса
+TOLERANCE = 0.15
+
+
+def make_offer() -> Offer:
+    return Offer(
+        id=1, title="Скидка 20% на подключение интернета", description="Описание предложения " * 10,
+        background_image_url="https://cdn.example.com/backgrounds/1/image.png",
+        company_logo_url="https://cdn.example.com/logos/1/logo.png",
+        company_name="Уфанет", created_at=datetime(2025, 5, 1, 12, 0, tzinfo=timezone.utc),
+    )
+
+
+def cases() -> dict:
+    offer = make_offer()
+    validated = OfferRead.model_validate(offer)
+    token = create_access_token({"sub": "anon_5f0c6f7e-3c1a-4d59-9d1b-2a8f0b6c7d10", "role": "user"})
+    password_hash = get_password_hash("correct horse battery staple")
+    event = json.dumps({
+        "event": "offer_created", "offer_id": 12345, "title": "Скидка 20% на подключение интернета",
+        "city_ids": [1, 2, 3], "category_ids": [7], "ts": "2025-05-01T12:00:00Z",
+    }, ensure_ascii=False).encode()
+    return {
+        "offer.model_validate": lambda: OfferRead.model_validate(offer),
+        "offer.model_dump_json_mode": lambda: validated.model_dump(mode="json"),
+        "offer.dump_orm": lambda: OfferRead.dump_orm(offer, by_alias=False, city_id=1, category_id=1),
+        "token.create": lambda: create_access_token({"sub": "anon_5f0c6f7e", "role": "user"}),
+        "token.decode": lambda: decode_access_token(token),
+        # rounds - из pwd_context, как в проде
+        "bcrypt.hash": lambda: get_password_hash("correct horse battery staple"),
+        "bcrypt.verify": lambda: verify_password("correct horse battery staple", password_hash),
+        "kafka.decode_event": lambda: decode_event(event),
+    }
+
+
+def measure(call) -> dict:
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=REPEAT, number=number)]
+    median = statistics.median(runs)
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(min(runs), 3),
+        "spread": round(statistics.stdev(runs) / median, 4),
+        "number": number,
+    }
+
+
+def compare(name: str, result: dict, baseline: dict | None, tolerance: float) -> str | None:
+    if baseline is None:
+        return None
+    allowed = max(tolerance, 3 * result["spread"])
+    ratio = result["median_us"] / baseline["median_us"]
+    if ratio > 1 + allowed:
+        return f"{name}: {baseline['median_us']:.1f} -> {result['median_us']:.1f} us (+{(ratio - 1) * 100:.0f}%)"
+    return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="записать результаты как новую базу")
+    parser.add_argument("--only", nargs="*", help="только замеры, содержащие эти подстроки")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    selected = cases()
+    if args.only:
+        selected = {name: call for name, call in selected.items() if any(s in name for s in args.only)}
+
+    results, regressions = {}, []
+    print(f"{'case':28} {'median, us':>11} {'min, us':>10} {'spread':>7} {'base, us':>10}")
+    for name, call in selected.items():
+        result = results[name] = measure(call)
+        base = baseline.get(name)
+        print(f"{name:28} {result['median_us']:11.2f} {result['min_us']:10.2f} {result['spread']:7.1%} "
+              f"{base['median_us'] if base else float('nan'):10.2f}")
+        regression = compare(name, result, base, args.tolerance)
+        if regression:
+            regressions.append(regression)
+
+    if args.save:
+        # частичный прогон (--only) не затирает остальные замеры
+        merged = {**baseline, **results}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": sys.version.split()[0], "bcrypt_rounds": pwd_context.handler("bcrypt").default_rounds},
+                "results": merged,
+            }, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"-> {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\nРегрессии:")
+        print("\n".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Сериализация ответов: прежний путь (model_validate + model_dump + json)
+против dump_orm + orjson (для справочников - стоимость перезагрузки снимка,
+сами запросы отдают уже сериализованные байты).
+
+    python -m benchmarks.bench_serialization [число_вызовов]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from core.responses import FastJSONResponse, dumps
+from db.models import Offer, City
+from schemas.city import CityRead
+from schemas.offer import OfferRead
+
+
+def make_offers(n: int) -> list[Offer]:
+    now = datetime.now(timezone.utc)
+    return [
+        Offer(
+            id=i, title=f"Предложение {i}", description="Описание " * 10,
+            background_image_url=f"https://cdn.example.com/backgrounds/{i}/image.png",
+            company_logo_url=f"https://cdn.example.com/logos/{i}/logo.png",
+            company_name=f"Компания {i}", created_at=now,
+        )
+        for i in range(n)
+    ]
+
+
+def make_cities(n: int) -> list[City]:
+    return [City(id=i, name=f"Город {i}", offers_count=i % 7) for i in range(n)]
+
+
+def offers_before(offers):
+    payload = []
+    for offer_obj in offers:
+        offer_data = OfferRead.model_validate(offer_obj)
+        offer_data.category_id = 1
+        offer_data.city_id = 1
+        payload.append(offer_data.model_dump(mode="json"))
+    return JSONResponse(content=payload).body
+
+
+def offers_after(offers):
+    payload = [OfferRead.dump_orm(o, by_alias=False, city_id=1, category_id=1) for o in offers]
+    return FastJSONResponse(content=payload).body
+
+
+cities_adapter = TypeAdapter(list[CityRead])
+
+
+def cities_before(cities):
+    # так FastAPI отдаёт response_model=List[CityRead]
+    validated = cities_adapter.validate_python(cities, from_attributes=True)
+    return JSONResponse(content=cities_adapter.dump_python(validated, mode="json", by_alias=True)).body
+
+
+def per_call_us(call, number: int) -> float:
+    call()
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 2000):
+    offers = make_offers(5)   # страница ленты
+    cities = make_cities(300)
+    # совпадает, потому что URL в make_offers уже в нормальной форме pydantic
+    assert offers_before(offers) == offers_after(offers)
+    assert cities_before(cities) == dumps([CityRead.dump_orm(c) for c in cities])
+
+    rows = [
+        ("GET /api/offers (5 offers)", lambda: offers_before(offers), lambda: offers_after(offers)),
+        # после: столько стоит перезагрузка снимка, сам запрос отдаёт готовые items_json
+        ("GET /api/cities (300 cities)", lambda: cities_before(cities),
+         lambda: dumps([CityRead.dump_orm(c) for c in cities])),
+    ]
+    print(f"{'path':30} {'before, us':>11} {'after, us':>10} {'speedup':>8}")
+    for name, before, after in rows:
+        t_before = per_call_us(before, number)
+        t_after = per_call_us(after, number)
+        print(f"{name:30} {t_before:11.1f} {t_after:10.1f} {t_before / t_after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
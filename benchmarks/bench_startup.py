@@ -0,0 +1,83 @@
+"""
+Холодный старт: каждый замер - в новом процессе интерпретатора.
+
+- import main: импорт приложения (без lifespan);
+- warmup: security.warmup() - бэкенд bcrypt и jose, как в lifespan;
+- first token / first hash: первый выпуск JWT и первый bcrypt без прогрева и после него.
+
+    python -m benchmarks.bench_startup [число_процессов] [--top N]
+
+--top N дополнительно печатает N модулей с наибольшим собственным временем
+импорта (python -X importtime).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ENV = {
+    **os.environ,
+    "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite+aiosqlite://"),
+    "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret"),
+}
+
+PROBE = """
+import json, sys, time
+def ms(t): return round((time.perf_counter() - t) * 1000, 2)
+out = {}
+t = time.perf_counter(); import main; out["import main"] = ms(t)
+from core import security
+if sys.argv[1] == "warm":
+    t = time.perf_counter(); security.warmup(); out["warmup"] = ms(t)
+t = time.perf_counter(); security.create_access_token({"sub": "probe"}); out[sys.argv[1] + ": first token"] = ms(t)
+t = time.perf_counter(); security.get_password_hash("probe"); out[sys.argv[1] + ": first hash"] = ms(t)
+print(json.dumps(out))
+"""
+
+
+def probe(mode: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, mode], env=ENV, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_time_top(n: int) -> list[tuple[int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], env=ENV, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(self_us), name))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main(runs: int = 5, top: int = 0):
+    samples: dict[str, list[float]] = {}
+    for _ in range(runs):
+        for mode in ("cold", "warm"):
+            for name, value in probe(mode).items():
+                samples.setdefault(name, []).append(value)
+
+    print(f"{'step':24} {'median, ms':>11} {'min, ms':>9}")
+    for name, values in samples.items():
+        print(f"{name:24} {statistics.median(values):11.1f} {min(values):9.1f}")
+
+    if top:
+        print(f"\n{'self, ms':>9}  module")
+        for self_us, name in import_time_top(top):
+            print(f"{self_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    top = 0
+    if "--top" in args:
+        i = args.index("--top")
+        top = int(args[i + 1])
+        del args[i:i + 2]
+    main(int(args[0]) if args else 5, top)
@@ -0,0 +1,89 @@
+"""
+Микробенчмарк накладных расходов Python на горячие запросы crud:
+построение select() на каждый вызов против готовых выражений с bindparam
+(и lambda_stmt для сравнения).
+
+Запросы выполняются на пустой SQLite в памяти, поэтому разница между
+вариантами - это построение выражения, ключ кэша и компиляция.
+
+    python -m benchmarks.bench_statements [число_вызовов]
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from sqlalchemy import create_engine, lambda_stmt
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, selectinload
+
+from db.base import Base
+from db.crud import USER_BY_USERNAME, OFFERS_BY_CITY_AND_CATEGORY
+from db.models import User, Offer, offer_city, offer_category
+
+
+# --- как запросы строились раньше ---
+
+def user_by_username_select(username: str):
+    return select(User).where(User.username == username)
+
+def offers_by_city_and_category_select(city_id, category_id, limit, offset):
+    query = select(Offer).join(offer_city).where(offer_city.c.city_id == city_id)
+    if category_id is not None:
+        query = query.join(offer_category).where(offer_category.c.category_id == category_id)
+    query = query.options(
+        selectinload(Offer.cities),
+        selectinload(Offer.categories)
+    )
+    return query.order_by(Offer.created_at).limit(limit).offset(offset)
+
+
+# --- lambda_stmt ---
+
+def user_by_username_lambda(username: str):
+    return lambda_stmt(lambda: select(User).where(User.username == username))
+
+def offers_by_city_and_category_lambda(city_id, category_id, limit, offset):
+    stmt = lambda_stmt(lambda: select(Offer).join(offer_city).where(offer_city.c.city_id == city_id))
+    stmt += lambda s: s.join(offer_category).where(offer_category.c.category_id == category_id)
+    stmt += lambda s: s.options(
+        selectinload(Offer.cities),
+        selectinload(Offer.categories)
+    ).order_by(Offer.created_at).limit(limit).offset(offset)
+    return stmt
+
+
+CASES = [
+    ("get_user_by_username",
+     lambda s: s.execute(user_by_username_select("anon_1")),
+     lambda s: s.execute(user_by_username_lambda("anon_1")),
+     lambda s: s.execute(USER_BY_USERNAME, {"username": "anon_1"})),
+    ("get_offers_by_city_and_category",
+     lambda s: s.execute(offers_by_city_and_category_select(1, 2, 5, 0)),
+     lambda s: s.execute(offers_by_city_and_category_lambda(1, 2, 5, 0)),
+     lambda s: s.execute(OFFERS_BY_CITY_AND_CATEGORY, {"city_id": 1, "category_id": 2, "limit": 5, "offset": 0})),
+]
+
+
+def per_call_us(session: Session, call, number: int) -> float:
+    run = lambda: call(session).all()
+    run()  # прогрев кэша компиляции
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main(number: int = 2000):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        print(f"{'query':33} {'select(), us':>13} {'lambda, us':>11} {'prebuilt, us':>13} {'speedup':>8}")
+        for name, before, via_lambda, prebuilt in CASES:
+            t_before = per_call_us(session, before, number)
+            t_lambda = per_call_us(session, via_lambda, number)
+            t_after = per_call_us(session, prebuilt, number)
+            print(f"{name:33} {t_before:13.1f} {t_lambda:11.1f} {t_after:13.1f} {t_before / t_after:7.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,267 @@
+"""
+Нагрузочный прогон ленты, поиска и логина: наполняет БД, гоняет каждый
+сценарий с фиксированной конкурентностью и пишет JSON с RPS и p50/p95/p99
+по сценариям (его удобно сравнивать между релизами).
+
+    python -m benchmarks.loadtest --recreate --cities 50 --categories 20 --offers 2000 \\
+        --concurrency 32 --requests 2000 --out loadtest.json
+
+По умолчанию приложение вызывается в процессе (httpx.ASGITransport, без Kafka).
+БД прогона - только LOADTEST_DATABASE_URL (без него - файл sqlite как
+заглушка; на нём параллельное создание анонимусов упирается в блокировку
+файла); экспортированные DATABASE_URL и REPLICA_DATABASE_URL не используются.
+С --url запросы идут на запущенный сервер, он должен смотреть в ту же базу.
+Схема пересоздаётся и наполняется только с --recreate, и только на локальном
+хосте (иначе нужен ещё --allow-remote).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+LOADTEST_DATABASE_URL = os.getenv("LOADTEST_DATABASE_URL", "sqlite+aiosqlite:///loadtest.db")
+# приложение и наполнение работают только с базой прогона
+os.environ["DATABASE_URL"] = LOADTEST_DATABASE_URL
+# пустое значение, а не pop: load_dotenv() в core.settings не перезапишет его из .env
+os.environ["REPLICA_DATABASE_URL"] = ""
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+
+from core.security import get_password_hash
+from db import refdata
+from db.base import engine, Base, AsyncSessionLocal
+from db.crud import recount_offers
+from db.models import City, Category, Offer, User, RoleEnum, offer_city, offer_category
+
+LOGIN_USERNAME = "loadtest"
+LOGIN_PASSWORD = "loadtest-password"
+BCRYPT_BOUND = {"GET /api/offers (anon)", "POST /api/auth/token"}
+LOCAL_HOSTS = {None, "", "localhost", "127.0.0.1", "::1"}
+# 404 - законный ответ ленты и поиска на случайную пару город/категория или подстроку
+EXPECTED_STATUSES = {404}
+
+
+def check_recreate_target(url: str, allow_remote: bool):
+    """
+    Пересоздание схемы - только на локальной базе, если не разрешено явно.
+    """
+    host = make_url(url).host
+    if host not in LOCAL_HOSTS and not allow_remote:
+        raise SystemExit(
+            f"--recreate пересоздаст схему на {host}; для нелокальной базы добавьте --allow-remote"
+        )
+
+
+async def seed(cities: int, categories: int, offers: int, seed_value: int):
+    rnd = random.Random(seed_value)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(City), [{"id": i, "name": f"Город {i}"} for i in range(1, cities + 1)])
+        await conn.execute(insert(Category), [
+            {"id": i, "name": f"Категория {i}", "imageUrl": f"https://cdn.example.com/categories/{i}.png"}
+            for i in range(1, categories + 1)
+        ])
+        await conn.execute(insert(Offer), [
+            {
+                "id": i, "title": f"Предложение {i}", "description": "Описание предложения " * 5,
+                "background_image_url": f"https://cdn.example.com/backgrounds/{i}.png",
+                "company_logo_url": f"https://cdn.example.com/logos/{i}.png",
+                "company_name": f"Компания {i % 97}",
+            }
+            for i in range(1, offers + 1)
+        ])
+        # каждое предложение - в 1-3 городах и 1-2 категориях
+        await conn.execute(insert(offer_city), [
+            {"offer_id": i, "city_id": c}
+            for i in range(1, offers + 1)
+            for c in rnd.sample(range(1, cities + 1), min(cities, rnd.randint(1, 3)))
+        ])
+        await conn.execute(insert(offer_category), [
+            {"offer_id": i, "category_id": c}
+            for i in range(1, offers + 1)
+            for c in rnd.sample(range(1, categories + 1), min(categories, rnd.randint(1, 2)))
+        ])
+        await conn.execute(insert(User), [{
+            "username": LOGIN_USERNAME, "hashed_password": get_password_hash(LOGIN_PASSWORD), "role": RoleEnum.user,
+        }])
+    async with AsyncSessionLocal() as db:
+        await recount_offers(db)
+
+
+def scenarios(cities: int, categories: int, rnd: random.Random) -> dict:
+    """
+    Имя сценария -> функция, выполняющая один запрос.
+    """
+    def offers_params():
+        params = {"city_id": rnd.randint(1, cities), "offset": rnd.choice((0, 0, 0, 5, 10))}
+        if rnd.random() < 0.5:
+            params["category_id"] = rnd.randint(1, categories)
+        return params
+
+    async def offers_anon(client, token):
+        return await client.get("/api/offers/", params=offers_params())
+
+    async def offers_auth(client, token):
+        return await client.get("/api/offers/", params=offers_params(), headers={"Authorization": f"Bearer {token}"})
+
+    async def offers_search(client, token):
+        return await client.get("/api/offers/search", params={"title": str(rnd.randint(1, 99)), "limit": 20})
+
+    async def cities_search(client, token):
+        return await client.get("/api/cities/search", params={"title": str(rnd.randint(1, 9)), "limit": 20})
+
+    async def cities_autocomplete(client, token):
+        return await client.get("/api/cities/autocomplete", params={"q": "Гор"})
+
+    async def login(client, token):
+        return await client.post("/api/auth/token", data={"username": LOGIN_USERNAME, "password": LOGIN_PASSWORD})
+
+    return {
+        "GET /api/offers (anon)": offers_anon,
+        "GET /api/offers (auth)": offers_auth,
+        "GET /api/offers/search": offers_search,
+        "GET /api/cities/search": cities_search,
+        "GET /api/cities/autocomplete": cities_autocomplete,
+        "POST /api/auth/token": login,
+    }
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+async def run_scenario(client, call, token: str, concurrency: int, requests: int) -> dict:
+    latencies: list[float] = []
+    # код ответа -> сколько раз; "error" - сетевая ошибка без ответа
+    statuses: Counter[str] = Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await call(client, token)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError:
+                statuses["error"] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    errors = sum(
+        count for status, count in statuses.items()
+        if status == "error" or (int(status) >= 400 and int(status) not in EXPECTED_STATUSES)
+    )
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+    }
+
+
+def make_client(url: str | None, concurrency: int) -> httpx.AsyncClient:
+    if url:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        return httpx.AsyncClient(base_url=url, limits=limits, timeout=30)
+    from main import app
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30)
+
+
+async def main(args):
+    # httpx пишет в INFO каждый запрос - тысячи строк на прогон
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.recreate:
+        check_recreate_target(LOADTEST_DATABASE_URL, args.allow_remote)
+        await seed(args.cities, args.categories, args.offers, args.seed)
+    if not args.url:
+        # lifespan (Kafka, прогрев) в процессе не запускаем - только справочники
+        async with AsyncSessionLocal() as db:
+            await refdata.load_all(db)
+
+    rnd = random.Random(args.seed)
+    selected = scenarios(args.cities, args.categories, rnd)
+    if args.only:
+        selected = {name: call for name, call in selected.items() if any(s in name for s in args.only)}
+
+    results = {}
+    async with make_client(args.url, args.concurrency) as client:
+        response = await client.post(
+            "/api/auth/token", data={"username": LOGIN_USERNAME, "password": LOGIN_PASSWORD}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        for name, call in selected.items():
+            # логин и создание анонимуса упираются в bcrypt - прогоняем меньше
+            requests = args.requests
+            if name in BCRYPT_BOUND:
+                requests = max(args.concurrency, args.requests // 10)
+            await run_scenario(client, call, token, args.concurrency, min(requests, args.warmup))
+            results[name] = await run_scenario(client, call, token, args.concurrency, requests)
+            print(f"{name:30} {results[name]['rps']:8.1f} rps  p50 {results[name]['p50_ms']:7.2f}  "
+                  f"p95 {results[name]['p95_ms']:7.2f}  p99 {results[name]['p99_ms']:7.2f} ms  "
+                  f"errors {results[name]['errors']}  {results[name]['statuses']}")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "target": args.url or "in-process",
+            "database": engine.url.render_as_string(hide_password=True),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": {"cities": args.cities, "categories": args.categories, "offers": args.offers, "random": args.seed},
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"-> {args.out}")
+    await engine.dispose()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес запущенного сервера; без него - приложение в процессе")
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--offers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора данных и запросов")
+    parser.add_argument(
+        "--recreate", action="store_true", help="пересоздать схему в LOADTEST_DATABASE_URL и наполнить её"
+    )
+    parser.add_argument("--allow-remote", action="store_true", help="разрешить --recreate на нелокальном хосте")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=100, help="запросов прогрева на сценарий (не в отчёте)")
+    parser.add_argument("--only", nargs="*", help="только сценарии, содержащие эти подстроки")
+    parser.add_argument("--out", default="loadtest.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,173 @@
+import gzip
+
+from fastapi import Response
+
+from core.settings import settings
+
+try:
+    import brotli
+except ImportError:  # без brotli остаётся только gzip
+    brotli = None
+
+# ответы меньше порога не сжимаем - заголовки и CPU дороже выигрыша
+COMPRESS_MIN_SIZE = settings.compress_min_size
+GZIP_LEVEL = settings.gzip_level
+BROTLI_QUALITY = settings.brotli_quality
+
+_COMPRESSIBLE = (b"application/json", b"text/")
+
+
+def _compressible(headers) -> bool:
+    return any(k == b"content-type" and v.startswith(_COMPRESSIBLE) for k, v in headers)
+
+
+def _with_vary(headers) -> list:
+    """
+    Vary: Accept-Encoding на всех ответах, которые могли быть сжаты, в том числе
+    отданных как есть: иначе общий кэш отдаст несжатое тело клиенту, просившему
+    br/gzip, или наоборот. Существующий Vary дополняется.
+    """
+    headers = list(headers)
+    for i, (k, v) in enumerate(headers):
+        if k == b"vary":
+            tokens = {t.strip().lower() for t in v.split(b",")}
+            if b"accept-encoding" not in tokens and b"*" not in tokens:
+                headers[i] = (k, v + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Выбирает br или gzip по Accept-Encoding (q=0 - запрет), br предпочтительнее.
+    "*" разрешает только кодировки, не перечисленные явно.
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    rejected = set()
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = None
+        if q is None:
+            continue
+        (accepted if q > 0 else rejected).add(name)
+
+    def allowed(encoding: str) -> bool:
+        if encoding in accepted:
+            return True
+        return "*" in accepted and encoding not in rejected
+
+    if brotli is not None and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class PrecompressedBody:
+    """
+    Закэшированное тело ответа и его сжатые варианты: каждый вариант
+    сжимается один раз, при первом запросе с такой кодировкой.
+    """
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._variants: dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        data = self._variants.get(encoding)
+        if data is None:
+            data = self._variants[encoding] = compress(self.body, encoding)
+        return data
+
+    def response(self, accept_encoding: str | None, headers: dict | None = None) -> Response:
+        headers = dict(headers or {})
+        # тело могло быть сжато - Vary и у несжатого варианта
+        headers["vary"] = "Accept-Encoding"
+        encoding = choose_encoding(accept_encoding) if len(self.body) >= COMPRESS_MIN_SIZE else None
+        if encoding is None:
+            return Response(content=self.body, media_type=self.media_type, headers=headers)
+        headers["content-encoding"] = encoding
+        return Response(content=self.variant(encoding), media_type=self.media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    Чистый ASGI middleware: сжимает несжатые ответы от COMPRESS_MIN_SIZE байт.
+    Потоковые ответы и ответы с уже выставленным Content-Encoding не трогает.
+    Ответам сжимаемых типов ставит Vary: Accept-Encoding, даже если не сжимал.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start" and _compressible(message.get("headers", [])):
+                    message = {**message, "headers": _with_vary(message["headers"])}
+                await send(message)
+
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            headers = pending.get("headers", [])
+            body = message.get("body", b"")
+            if not _compressible(headers):
+                await send(pending)
+                await send(message)
+                return
+            headers = _with_vary(headers)
+            if (
+                message.get("more_body")
+                or len(body) < COMPRESS_MIN_SIZE
+                or any(k == b"content-encoding" for k, _ in headers)
+            ):
+                await send({**pending, "headers": headers})
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            await send({**pending, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,26 @@
+from fastapi import Request, Response, status
+
+from core.metrics import CACHE_REQUESTS
+
+_not_modified = CACHE_REQUESTS.labels("etag", "not_modified")
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Проверка If-None-Match (слабое сравнение, как требует RFC 9110 для GET).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def not_modified(etag: str, headers: dict | None = None) -> Response:
+    _not_modified.inc()
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"etag": etag, **(headers or {})},
+    )
@@ -0,0 +1,182 @@
+import mmap
+import os
+import struct
+import tempfile
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировок нет, консьюмер запускает каждый воркер
+    fcntl = None
+
+_MAGIC = b"UAEVRNG2"
+# magic, число слотов, размер слота, boot id хоста, pid владельца запуска, номер последней записи
+_HEADER = struct.Struct("<8sII16sQQ")
+# serve.py передаёт воркерам свой pid: все воркеры одного запуска - одно поколение кольца
+RUN_PID_ENV = "UFANET_RUN_PID"
+# номер записи в слоте (0 - слот пишется), длина данных
+_SLOT = struct.Struct("<QI")
+
+
+def default_ring_path() -> str:
+    # /dev/shm - память, а не диск; общий для всех воркеров хоста
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "ufanet-ads-events.ring")
+
+
+def run_owner_pid() -> int:
+    # без serve.py (uvicorn main:app) запуск - сам процесс
+    return int(os.environ.get(RUN_PID_ENV) or os.getpid())
+
+
+def _boot_id() -> bytes:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return uuid.UUID(f.read().strip()).bytes
+    except (OSError, ValueError):
+        return bytes(16)
+
+
+def _alive(pid: int) -> bool:
+    if fcntl is None:
+        # Windows: os.kill(pid, 0) завершил бы процесс, проверить нечем
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class EventRing:
+    """
+    Кольцевой буфер последних событий в mmap-файле, общий для процессов хоста.
+    Пишет один процесс (держатель HostLock), читают все. Событие - готовый JSON.
+
+    Запись: слот помечается номером 0, пишутся данные, затем номер записи в слоте
+    и в заголовке. Чтение сверяет номер слота до и после копирования и
+    пропускает слот, который в этот момент перезаписывается.
+
+    В заголовке - поколение: boot id и pid владельца запуска (owner). Файл
+    остаётся после остановки (в том числе аварийной); если его владелец
+    мёртв или файл с прошлой загрузки хоста, кольцо очищается - события
+    прошлого запуска не отдаются как свежие.
+    """
+    def __init__(self, path: str, capacity: int, slot_size: int, owner: int | None = None):
+        # раскладка - в имени файла: воркеры с другими настройками (при выкатке)
+        # получают свой файл и не обрезают чужой, уже отображённый в память
+        self.path = path = f"{path}.{capacity}x{slot_size}"
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._stride = _SLOT.size + slot_size
+        owner = run_owner_pid() if owner is None else owner
+        boot_id = _boot_id()
+        fresh = _HEADER.pack(_MAGIC, capacity, slot_size, boot_id, owner, 0)
+        size = _HEADER.size + capacity * self._stride
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                header = os.read(fd, _HEADER.size)
+                reuse = os.fstat(fd).st_size == size and header[:16] == fresh[:16]
+                if reuse:
+                    _, _, _, file_boot_id, file_owner, _ = _HEADER.unpack(header)
+                    # свой запуск или другой, ещё живой (выкатка рядом со старым) - кольцо общее
+                    reuse = file_boot_id == boot_id and (file_owner == owner or _alive(file_owner))
+                if not reuse:
+                    # новый, испорченный или оставшийся от прошлого запуска файл - начинаем с пустого
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, fresh)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _last_seq(self) -> int:
+        return _HEADER.unpack_from(self._mm, 0)[-1]
+
+    def _offset(self, seq: int) -> int:
+        return _HEADER.size + (seq % self.capacity) * self._stride
+
+    def append(self, data: bytes) -> bool:
+        if len(data) > self.slot_size:
+            return False
+        seq = self._last_seq() + 1
+        offset = self._offset(seq)
+        _SLOT.pack_into(self._mm, offset, 0, len(data))
+        start = offset + _SLOT.size
+        self._mm[start:start + len(data)] = data
+        _SLOT.pack_into(self._mm, offset, seq, len(data))
+        struct.pack_into("<Q", self._mm, _HEADER.size - 8, seq)
+        return True
+
+    def latest(self) -> list[bytes]:
+        """
+        События от старых к новым.
+        """
+        last = self._last_seq()
+        events = []
+        for seq in range(max(1, last - self.capacity + 1), last + 1):
+            offset = self._offset(seq)
+            slot_seq, length = _SLOT.unpack_from(self._mm, offset)
+            if slot_seq != seq or length > self.slot_size:
+                continue
+            start = offset + _SLOT.size
+            data = self._mm[start:start + length]
+            if _SLOT.unpack_from(self._mm, offset)[0] != seq:
+                continue
+            events.append(data)
+        return events
+
+    def json_body(self) -> bytes:
+        # события уже в JSON - склеиваем без разбора
+        return b'{"events":[' + b",".join(self.latest()) + b"]}"
+
+    def close(self):
+        self._mm.close()
+
+
+class HostLock:
+    """
+    Эксклюзивная flock-блокировка на файл: ровно один процесс хоста держит её.
+    Снимается ядром при смерти процесса, и её может взять другой воркер.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,8 @@
+import json
+
+
+def decode_event(value: bytes) -> dict:
+    """
+    Событие из Kafka: JSON в UTF-8. ValueError (в т.ч. UnicodeDecodeError) - битое сообщение.
+    """
+    return json.loads(value.decode())
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+from os import getenv
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# --- HTTP ---
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+HTTP_RESPONSES = Counter("http_responses_total", "HTTP-ответы по статусам", ["method", "route", "status"])
+
+# --- БД ---
+DB_STATEMENTS = Histogram(
+    "db_statements_per_request", "Количество SQL-запросов за HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34),
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL за HTTP-запрос", ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+# --- Kafka ---
+KAFKA_MESSAGES = Counter("kafka_messages_total", "Сообщения, прочитанные консьюмером", ["topic", "result"])
+KAFKA_LAG = Gauge("kafka_consumer_lag", "Отставание консьюмера от конца партиции", ["topic", "partition"])
+
+# --- Авторизация ---
+AUTH_HASH = Histogram(
+    "auth_hash_duration_seconds", "Время bcrypt-хэширования и проверки пароля", ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1),
+)
+ANON_USERS = Counter("anonymous_users_created_total", "Созданные анонимные пользователи")
+
+# --- Кэши ---
+CACHE_REQUESTS = Counter("cache_requests_total", "Обращения к кэшам в памяти", ["cache", "result"])
+
+
+POOL_STATS = ("size", "checked_out", "overflow", "checkouts", "wait_total_ms", "wait_max_ms")
+# как часто воркер переписывает значения пула в multiprocess-гаужи
+POOL_REFRESH_SECONDS = 5
+
+
+def multiprocess_mode() -> bool:
+    return bool(getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+class PoolCollector:
+    """
+    Снимает состояние пулов соединений в момент scrape, без затрат на запрос.
+    """
+    def __init__(self, engines: dict, stats_func):
+        self.engines = engines
+        self.stats_func = stats_func
+
+    def collect(self):
+        gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", f"Пул соединений: {key}", labels=["pool"])
+            for key in POOL_STATS
+        }
+        for name, engine in self.engines.items():
+            if engine is None:
+                continue
+            stats = self.stats_func(engine)
+            for key, gauge in gauges.items():
+                if key in stats:
+                    gauge.add_metric([name], stats[key])
+        yield from gauges.values()
+
+
+class PoolGauges:
+    """
+    Несколько воркеров: REGISTRY не экспортируется, /metrics собирает только
+    файлы PROMETHEUS_MULTIPROC_DIR. Поэтому каждый воркер сам переписывает
+    состояние своих пулов в multiprocess-гаужи (метка pid, только живые
+    процессы) - фоновой задачей и перед отдачей /metrics.
+    """
+    def __init__(self, engines: dict, stats_func):
+        self.engines = engines
+        self.stats_func = stats_func
+        self.gauges = {
+            key: Gauge(f"db_pool_{key}", f"Пул соединений: {key}", ["pool"], multiprocess_mode="liveall")
+            for key in POOL_STATS
+        }
+
+    def refresh(self):
+        for name, engine in self.engines.items():
+            if engine is None:
+                continue
+            stats = self.stats_func(engine)
+            for key, gauge in self.gauges.items():
+                if key in stats:
+                    gauge.labels(name).set(stats[key])
+
+
+_pool_gauges: PoolGauges | None = None
+
+
+def register_pool_collector(engines: dict, stats_func):
+    global _pool_gauges
+    if multiprocess_mode():
+        _pool_gauges = PoolGauges(engines, stats_func)
+    else:
+        REGISTRY.register(PoolCollector(engines, stats_func))
+
+
+async def refresh_pool_gauges_loop(interval: float = POOL_REFRESH_SECONDS):
+    if _pool_gauges is None:
+        return
+    while True:
+        _pool_gauges.refresh()
+        await asyncio.sleep(interval)
+
+
+def mark_worker_dead():
+    # файлы liveall-гаужей завершившегося воркера удаляются, его пулы пропадают из /metrics
+    if multiprocess_mode():
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render_latest() -> tuple[bytes, str]:
+    # при нескольких воркерах prometheus_client складывает значения через файлы в PROMETHEUS_MULTIPROC_DIR
+    if multiprocess_mode():
+        from prometheus_client import multiprocess
+        if _pool_gauges is not None:
+            _pool_gauges.refresh()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Чистый ASGI middleware: латентность и статусы по шаблону маршрута.
+    """
+    def __init__(self, app):
+        self.app = app
+        # готовые дочерние метрики: .labels() на каждый запрос заметно дороже
+        self._latency: dict[tuple[str, str], object] = {}
+        self._responses: dict[tuple[str, str, int], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched")
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = HTTP_LATENCY.labels(*key)
+            latency.observe(time.perf_counter() - started)
+            counter = self._responses.get((*key, status_code))
+            if counter is None:
+                counter = self._responses[(*key, status_code)] = HTTP_RESPONSES.labels(*key, str(status_code))
+            counter.inc()
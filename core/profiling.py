@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from core.settings import settings
+
+# доля запросов, которые профилируются без заголовка (0 - выключено)
+PROFILE_SAMPLE_RATE = settings.profile_sample_rate
+PROFILE_INTERVAL_MS = settings.profile_interval_ms
+PROFILE_KEEP = settings.profile_keep
+# профили - файлы <id>.folded (стеки) и <id>.json (маршрут, длительность) в этом каталоге:
+# его видят все воркеры хоста, поэтому id из x-profile-id находится на любом из них
+PROFILE_DIR = settings.profile_dir or os.path.join(tempfile.gettempdir(), "ufanet-ads-profiles")
+PROFILE_HEADER = b"x-profile"
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROFILE_ID = re.compile(r"[0-9a-f]{12}")
+
+logger = logging.getLogger("profiling")
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = filename[len(_ROOT) + 1:]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Сэмплирующий профайлер: отдельный поток раз в interval снимает стек
+    потока event loop. Результат - "folded stacks" (flamegraph.pl, speedscope).
+    В стек попадает всё, что исполняет loop, включая соседние запросы.
+    """
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._labels: dict = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = self._labels
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                parts.append(label)
+                frame = frame.f_back
+            if parts:
+                parts.reverse()
+                self.stacks[";".join(parts)] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _saved_meta() -> list[tuple[float, str]]:
+    found = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            path = os.path.join(PROFILE_DIR, name)
+            try:
+                found.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                # удалил соседний воркер
+                continue
+    found.sort()
+    return found
+
+
+def _store(profile_id: str, meta: dict, folded: str):
+    # блокирующий ввод-вывод: вызывается через asyncio.to_thread
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, profile_id)
+    with open(f"{path}.folded", "w", encoding="utf-8") as f:
+        f.write(folded)
+    # .json - последним: по нему профиль попадает в список, стеки к этому моменту уже записаны
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    saved = _saved_meta()
+    for _, meta_path in saved[:max(0, len(saved) - PROFILE_KEEP)]:
+        for old in (meta_path, f"{meta_path[:-len('.json')]}.folded"):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> list[dict]:
+    """
+    Сохранённые профили хоста, новые сверху (без стеков).
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for _, meta_path in reversed(_saved_meta()):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+        profiles.append({"id": os.path.basename(meta_path)[:-len(".json")], **meta})
+    return profiles
+
+
+def load_folded(profile_id: str) -> str | None:
+    if not _PROFILE_ID.fullmatch(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Чистый ASGI middleware: профилирует запрос с заголовком X-Profile
+    (только суперадмину, проверяет authorize(token)) или случайную долю
+    PROFILE_SAMPLE_RATE запросов. Без заголовка и при нулевой доле -
+    только проверка заголовков. Одновременно работает один сэмплер на воркер.
+    """
+    def __init__(self, app, authorize):
+        self.app = app
+        self.authorize = authorize
+        self._busy = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = False
+        token = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                requested = True
+            elif name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer":
+                    token = None
+        if requested:
+            requested = bool(token) and await self.authorize(token)
+        if not requested and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        if self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start" and requested:
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - started
+            # join потока сэмплера и запись файлов - не в event loop
+            await asyncio.to_thread(sampler.stop)
+            self._busy = False
+            route = scope.get("route")
+            meta = {
+                "route": f"{scope['method']} {route.path if route is not None else scope['path']}",
+                "requested": requested,
+                "duration_ms": round(duration * 1000, 3),
+                "samples": sum(sampler.stacks.values()),
+            }
+            try:
+                await asyncio.to_thread(_store, profile_id, meta, sampler.folded())
+            except OSError:
+                logger.exception("Профиль %s не сохранён в %s", profile_id, PROFILE_DIR)
@@ -1,27 +1,33 @@
 import time
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
 from passlib.context import CryptContext
-from dotenv import load_dotenv
-from os import getenv
-load_dotenv()
 
-SECRET_KEY = getenv("SECRET_KEY")
+from core.metrics import AUTH_HASH
+from core.settings import settings
+
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 360000))
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_verify_timer = AUTH_HASH.labels("verify")
+_hash_timer = AUTH_HASH.labels("hash")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with _verify_timer.time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with _hash_timer.time():
+        return pwd_context.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    # jose тянет cryptography (~50 мс импорта) - импортируем при первом вызове (см. warmup)
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
@@ -30,8 +36,18 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 
 
 def decode_access_token(token: str) -> dict:
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return {}
+
+
+def warmup():
+    """
+    Инициализация при старте воркера, а не на первом запросе: passlib выбирает
+    бэкенд bcrypt и прогоняет его самопроверку, jose импортирует криптографию.
+    """
+    pwd_context.handler("bcrypt").get_backend()
+    decode_access_token(create_access_token({"sub": "warmup"}))
@@ -0,0 +1,120 @@
+import os
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+
+def _bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Настройки из окружения (и .env), читаются один раз при первом импорте.
+    Модули берут отсюда свои константы.
+    """
+    # --- БД ---
+    database_url: str | None
+    replica_database_url: str | None
+    replica_retry_seconds: float
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_pool_pre_ping: bool
+    db_pool_warmup: int
+    db_statement_cache_size: int
+    sql_statement_warn: int
+    slow_query_ms: float
+    slow_query_explain_interval: float
+    slow_query_keep: int
+    # --- Кэши ---
+    refdata_ttl: float
+    refdata_max_age: int
+    offers_etag_ttl: int
+    # --- Авторизация ---
+    secret_key: str | None
+    access_token_expire_minutes: int
+    # --- HTTP ---
+    compress_min_size: int
+    gzip_level: int
+    brotli_quality: int
+    profile_sample_rate: float
+    profile_interval_ms: float
+    profile_keep: int
+    profile_dir: str | None
+    # --- Kafka ---
+    kafka_bootstrap_servers: str
+    kafka_topic: str
+    kafka_group_id: str
+    kafka_buffer_size: int
+    kafka_ring_path: str | None
+    kafka_ring_slot_size: int
+    kafka_leader_retry: float
+    # --- Запуск (serve.py) ---
+    web_host: str
+    web_port: int
+    web_workers: int
+    web_backlog: int
+    web_keepalive: int
+    web_graceful_timeout: int
+    web_limit_concurrency: int | None
+    web_access_log: bool
+    web_forwarded_allow_ips: str
+
+    @classmethod
+    def from_env(cls, env=None) -> "Settings":
+        env = os.environ if env is None else env
+        get = env.get
+        db_pool_size = int(get("DB_POOL_SIZE", 5))
+        return cls(
+            database_url=get("DATABASE_URL"),
+            replica_database_url=get("REPLICA_DATABASE_URL"),
+            # на сколько секунд уводим чтение на основную БД после ошибки соединения с репликой
+            replica_retry_seconds=float(get("REPLICA_RETRY_SECONDS", 30)),
+            db_pool_size=db_pool_size,
+            db_max_overflow=int(get("DB_MAX_OVERFLOW", 10)),
+            db_pool_timeout=float(get("DB_POOL_TIMEOUT", 30)),
+            db_pool_recycle=int(get("DB_POOL_RECYCLE", 1800)),
+            db_pool_pre_ping=_bool(get("DB_POOL_PRE_PING", "1")),
+            db_pool_warmup=int(get("DB_POOL_WARMUP", db_pool_size)),
+            db_statement_cache_size=int(get("DB_STATEMENT_CACHE_SIZE", 100)),
+            sql_statement_warn=int(get("SQL_STATEMENT_WARN", 20)),
+            slow_query_ms=float(get("SLOW_QUERY_MS", 0)),
+            slow_query_explain_interval=float(get("SLOW_QUERY_EXPLAIN_INTERVAL", 30)),
+            slow_query_keep=int(get("SLOW_QUERY_KEEP", 100)),
+            refdata_ttl=float(get("REFDATA_TTL", 60)),
+            refdata_max_age=int(get("REFDATA_MAX_AGE", 60)),
+            offers_etag_ttl=int(get("OFFERS_ETAG_TTL", 30)),
+            secret_key=get("SECRET_KEY"),
+            access_token_expire_minutes=int(get("ACCESS_TOKEN_EXPIRE_MINUTES", 360000)),
+            compress_min_size=int(get("COMPRESS_MIN_SIZE", 1024)),
+            gzip_level=int(get("GZIP_LEVEL", 6)),
+            brotli_quality=int(get("BROTLI_QUALITY", 5)),
+            profile_sample_rate=float(get("PROFILE_SAMPLE_RATE", 0)),
+            profile_interval_ms=float(get("PROFILE_INTERVAL_MS", 5)),
+            profile_keep=int(get("PROFILE_KEEP", 50)),
+            profile_dir=get("PROFILE_DIR"),
+            kafka_bootstrap_servers=get("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092"),
+            kafka_topic=get("KAFKA_TOPIC", "ad-events.ad-events"),
+            kafka_group_id=get("KAFKA_GROUP_ID", "mobile-proxy-group"),
+            kafka_buffer_size=int(get("KAFKA_BUFFER_SIZE", 5)),
+            kafka_ring_path=get("KAFKA_RING_PATH"),
+            kafka_ring_slot_size=int(get("KAFKA_RING_SLOT_SIZE", 64 * 1024)),
+            kafka_leader_retry=float(get("KAFKA_LEADER_RETRY", 5)),
+            web_host=get("WEB_HOST", "0.0.0.0"),
+            web_port=int(get("WEB_PORT", 3826)),
+            # по умолчанию - воркер на ядро
+            web_workers=int(get("WEB_WORKERS", 0)) or os.cpu_count() or 1,
+            web_backlog=int(get("WEB_BACKLOG", 2048)),
+            web_keepalive=int(get("WEB_KEEPALIVE", 65)),
+            web_graceful_timeout=int(get("WEB_GRACEFUL_TIMEOUT", 30)),
+            web_limit_concurrency=int(get("WEB_LIMIT_CONCURRENCY", 0)) or None,
+            web_access_log=_bool(get("WEB_ACCESS_LOG", "0")),
+            web_forwarded_allow_ips=get("WEB_FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        )
+
+
+load_dotenv()
+settings = Settings.from_env()
@@ -1,19 +1,72 @@
 import asyncio
+import time
 
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, InterfaceError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
-from os import getenv
-load_dotenv()
 
-DATABASE_URL = getenv("DATABASE_URL")
+from core.settings import settings
+from db.pool import TimedQueuePool
+
+DATABASE_URL = settings.database_url
+# необязательная реплика для чтения
+REPLICA_DATABASE_URL = settings.replica_database_url
+# на сколько секунд уводим чтение на основную БД после ошибки соединения с репликой
+REPLICA_RETRY_SECONDS = settings.replica_retry_seconds
+
+# Настройки пула соединений
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+DB_POOL_RECYCLE = settings.db_pool_recycle
+DB_POOL_PRE_PING = settings.db_pool_pre_ping
+# сколько соединений открыть при старте воркера
+DB_POOL_WARMUP = settings.db_pool_warmup
+# кэш подготовленных выражений asyncpg на соединение (0 - выключить, нужно за pgbouncer)
+DB_STATEMENT_CACHE_SIZE = settings.db_statement_cache_size
+
+
+def engine_options(url: str) -> dict:
+    options = {"echo": False, "future": True}
+    if url.startswith("sqlite"):
+        # у встраиваемой БД свой пул, настройки сетевого пула не применимы
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def configure_sqlite(engine):
+    """
+    SQLite: включает внешние ключи (ondelete=CASCADE) и отдаёт BEGIN под управление
+    SQLAlchemy - иначе драйвер сам начинает транзакции и SAVEPOINT не работает.
+    """
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
 
 # Создаём асинхронный движок (echo=True только для отладки)
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    future=True
-)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if DATABASE_URL.startswith("sqlite"):
+    configure_sqlite(engine)
 
 # Фабрика сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -22,6 +75,29 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+replica_engine = None
+AsyncReadSessionLocal = None
+if REPLICA_DATABASE_URL:
+    replica_engine = create_async_engine(REPLICA_DATABASE_URL, **engine_options(REPLICA_DATABASE_URL))
+    if REPLICA_DATABASE_URL.startswith("sqlite"):
+        configure_sqlite(replica_engine)
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
+_replica_down_until = 0.0
+
+
+def replica_available() -> bool:
+    return replica_engine is not None and time.monotonic() >= _replica_down_until
+
+
+def mark_replica_down():
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
 # Базовый класс для моделей
 Base = declarative_base()
 
@@ -29,10 +105,60 @@ async def create_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+# Счётчики для /internal/pool: сколько сессий выдано зависимостями и сколько реально открыто
+session_stats = {"provided": 0, "opened": 0}
+
+
+class LazySession:
+    """
+    Заместитель AsyncSession: сама сессия (а значит и соединение из пула)
+    создаётся только при первом обращении. Запрос, который ответил из
+    кэша в памяти, не трогает пул вовсе.
+    """
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: AsyncSession | None = None
+        session_stats["provided"] += 1
+
+    @property
+    def used(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+            session_stats["opened"] += 1
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
 # Зависимость FastAPI: получение сессии
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    session = LazySession(AsyncSessionLocal)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+# Зависимость FastAPI для маршрутов только на чтение: реплика, если она есть и жива.
+# Чтения, которые должны видеть запись этого же запроса, остаются на get_db.
+async def get_read_db(db: AsyncSession = Depends(get_db)):
+    if not replica_available():
+        # без реплики - та же сессия, что у get_db в этом запросе: два соединения
+        # с основной БД на запрос под нагрузкой исчерпали бы пул
+        yield db
+        return
+    session = LazySession(AsyncReadSessionLocal)
+    try:
+        yield session
+    except (OperationalError, InterfaceError, OSError):
+        mark_replica_down()
+        raise
+    finally:
+        await session.close()
@@ -1,40 +1,127 @@
+import base64
+import binascii
 from typing import Any, Coroutine, Sequence, List
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import HttpUrl
 from sqlalchemy.future import select
-from sqlalchemy import insert, delete, func, Row, RowMapping
+from sqlalchemy import insert, delete, update, func, bindparam, Integer, Row, RowMapping
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from db.models import User, RoleEnum, City, Category, Offer, Stat, offer_city, offer_category
 from core.security import get_password_hash
+from db import refdata, versions
+
+# Ограничения для поисковых выдач
+SEARCH_LIMIT_DEFAULT = 20
+SEARCH_LIMIT_MAX = 100
+# сколько строк тянем из курсора БД за одну порцию
+SEARCH_YIELD_PER = 50
 
 # --- etc ---
+async def stream_page(db: AsyncSession, stmt, limit: int) -> list:
+    """
+    Читает не более limit объектов через серверный курсор,
+    не материализуя всю выборку целиком.
+    """
+    # +1: роутеры запрашивают лишнюю строку, чтобы знать, есть ли следующая страница
+    limit = max(1, min(limit, SEARCH_LIMIT_MAX + 1))
+    stmt = stmt.limit(limit).execution_options(yield_per=SEARCH_YIELD_PER)
+    result = await db.stream_scalars(stmt)
+    try:
+        return [obj async for obj in result]
+    finally:
+        await result.close()
+
+def encode_cursor(value: str) -> str:
+    # курсор уходит в заголовок ответа, а там допустим только latin-1
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Некорректный курсор {cursor}")
+
 def count_affected(result):
     count = result.rowcount or 0
     if count == 0:
         raise NoResultFound()
     return count
 
-async def count_offers_for_city(db: AsyncSession, city_id: int) -> int:
-    return await db.scalar(
-        select(func.count()).select_from(offer_city).where(
-            offer_city.c.city_id == city_id
-        )
-    ) or 0
+# INSERT ... ON CONFLICT DO NOTHING есть у PostgreSQL и SQLite
+_INSERT_IGNORE = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+async def insert_ignore(db: AsyncSession, table, **values) -> int:
+    """
+    Вставка строки связи; если такая уже есть - ничего не делает.
+    Возвращает число вставленных строк.
+    """
+    dialect_insert = _INSERT_IGNORE.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=list(values))
+        result = await db.execute(stmt)
+        return result.rowcount or 0
+    # прочие диалекты: обычный INSERT в SAVEPOINT, дубликат откатываем
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(table).values(**values))
+    except IntegrityError:
+        return 0
+    return 1
+
+# --- Горячие запросы ---
+# Выражения строятся один раз при импорте, значения передаются через bindparam.
+# Ключ кэша у готового выражения запоминается, поэтому на вызов не тратится
+# ни построение select(), ни поиск скомпилированного SQL заново.
+# (lambda_stmt на этих запросах оказался медленнее, см. benchmarks/bench_statements.py)
+
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
 
-async def count_offers_for_category(db: AsyncSession, category_id: int) -> int:
-    return await db.scalar(
-        select(func.count()).select_from(offer_category).where(
-            offer_category.c.category_id == category_id
+def _offers_page(query):
+    return query.options(
+        selectinload(Offer.cities),
+        selectinload(Offer.categories)
+    ).order_by(Offer.created_at).limit(bindparam("limit", type_=Integer)).offset(bindparam("offset", type_=Integer))
+
+_offers_in_city = select(Offer).join(offer_city).where(offer_city.c.city_id == bindparam("city_id"))
+OFFERS_BY_CITY = _offers_page(_offers_in_city)
+OFFERS_BY_CITY_AND_CATEGORY = _offers_page(
+    _offers_in_city.join(offer_category).where(offer_category.c.category_id == bindparam("category_id"))
+)
+
+async def shift_offers_count(db: AsyncSession, model, ids, delta: int):
+    # ids - список id или подзапрос; выполняется в той же транзакции, что и изменение связей
+    await db.execute(
+        update(model).where(model.id.in_(ids)).values(offers_count=model.offers_count + delta)
+    )
+
+async def recount_offers(db: AsyncSession):
+    """
+    Пересчитывает offers_count у городов и категорий по таблицам связей
+    (один GROUP BY на таблицу).
+    """
+    for model, link_col in ((City, offer_city.c.city_id), (Category, offer_category.c.category_id)):
+        counts = (
+            select(link_col.label("ref_id"), func.count().label("cnt"))
+            .group_by(link_col)
+            .subquery()
+        )
+        await db.execute(update(model).values(offers_count=0))
+        await db.execute(
+            update(model).where(model.id == counts.c.ref_id).values(offers_count=counts.c.cnt)
         )
-    ) or 0
+    await db.commit()
+    refdata.cities.bump()
+    refdata.categories.bump()
 
 
 # --- Пользователи ---
 
 async def get_user_by_username(db: AsyncSession, username: str) -> User | None:
-    result = await db.execute(select(User).where(User.username == username))
+    result = await db.execute(USER_BY_USERNAME, {"username": username})
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, username: str, password: str, role: RoleEnum = RoleEnum.user) -> User:
@@ -60,32 +147,22 @@ async def create_city(db: AsyncSession, name: str) -> City:
     db.add(city)
     try:
         await db.commit()
+        refdata.cities.bump()
         await db.refresh(city)
         return city
     except IntegrityError:
         await db.rollback()
         raise
 
-async def get_cities_by_name(
-    db: AsyncSession,
-    name_substr: str
-) -> Sequence[City]:
-    stmt = (
-        select(City)
-        .where(City.name.ilike(f"%{name_substr}%"))
-        .order_by(City.name)
-    )
-    result = await db.execute(stmt)
-    return result.scalars().all()
-
 async def delete_city(db: AsyncSession, city_id: int) -> int:
-    linked = await count_offers_for_city(db, city_id)
+    linked = await db.scalar(select(City.offers_count).where(City.id == city_id)) or 0
     if linked > 0:
         # не удаляем, возвращаем признак ошибки
         raise ValueError(f"Город {city_id} связан {linked} раз к предложению")
     result = await db.execute(delete(City).where(City.id == city_id))
     count = count_affected(result)
     await db.commit()
+    refdata.cities.bump()
     return count
 
 async def add_city_to_offer(db: AsyncSession, offer_id: int, city_id: int):
@@ -97,15 +174,14 @@ async def add_city_to_offer(db: AsyncSession, offer_id: int, city_id: int):
     if not city:
         raise NoResultFound(f"City {city_id} not found")
 
-    stmt = pg_insert(offer_city).values(
-        offer_id=offer_id, city_id=city_id
-    ).on_conflict_do_nothing(
-        index_elements=["offer_id", "city_id"]
-    )
-
-    result = await db.execute(stmt)
-    count = count_affected(result)
+    count = await insert_ignore(db, offer_city, offer_id=offer_id, city_id=city_id)
+    if count == 0:
+        raise NoResultFound()
+    await shift_offers_count(db, City, [city_id], 1)
+    await versions.bump(db, "offers")
     await db.commit()
+    versions.invalidate("offers")
+    refdata.cities.bump()
     return count
 
 
@@ -125,45 +201,35 @@ async def remove_city_from_offer(db: AsyncSession, offer_id: int, city_id: int):
         )
     )
     count = count_affected(result)
+    await shift_offers_count(db, City, [city_id], -1)
+    await versions.bump(db, "offers")
     await db.commit()
+    versions.invalidate("offers")
+    refdata.cities.bump()
     return count
 
 # --- Категории ---
 
-async def get_all_categories(db: AsyncSession) -> Sequence[Category]:
-    result = await db.execute(select(Category))
-    return result.scalars().all()
-
 async def create_category(db: AsyncSession, name: str, image_url: str|HttpUrl) -> Category:
     category = Category(name=name, imageUrl=str(image_url))
     db.add(category)
     try:
         await db.commit()
+        refdata.categories.bump()
         await db.refresh(category)
         return category
     except IntegrityError:
         await db.rollback()
         raise
 
-async def get_categories_by_name(
-    db: AsyncSession,
-    name_substr: str
-) -> Sequence[Category]:
-    stmt = (
-        select(Category)
-        .where(Category.name.ilike(f"%{name_substr}%"))
-        .order_by(Category.name)
-    )
-    result = await db.execute(stmt)
-    return result.scalars().all()
-
 async def delete_category(db: AsyncSession, category_id: int) -> int:
-    linked = await count_offers_for_category(db, category_id)
+    linked = await db.scalar(select(Category.offers_count).where(Category.id == category_id)) or 0
     if linked > 0:
         raise ValueError(f"Категория {category_id} связана {linked} раз к предложению")
     result = await db.execute(delete(Category).where(Category.id == category_id))
     count = count_affected(result)
     await db.commit()
+    refdata.categories.bump()
     return count
 
 # --- Предложения ---
@@ -171,15 +237,11 @@ async def delete_category(db: AsyncSession, category_id: int) -> int:
 async def get_offers_by_city_and_category(
     db: AsyncSession, city_id: int, category_id: int | None = None, limit: int = 5, offset: int = 0
 ) -> Sequence[Offer]:
-    query = select(Offer).join(offer_city).where(offer_city.c.city_id == city_id)
-    if category_id is not None:
-        query = query.join(offer_category).where(offer_category.c.category_id == category_id)
-    query = query.options(
-        selectinload(Offer.cities),
-        selectinload(Offer.categories)
-    )
-    query = query.order_by(Offer.created_at).limit(limit).offset(offset)
-    result = await db.execute(query)
+    params = {"city_id": city_id, "limit": limit, "offset": offset}
+    if category_id is None:
+        result = await db.execute(OFFERS_BY_CITY, params)
+    else:
+        result = await db.execute(OFFERS_BY_CITY_AND_CATEGORY, {**params, "category_id": category_id})
     return result.scalars().all()
 
 async def create_offer(db: AsyncSession, title: str, description: str|None,
@@ -222,8 +284,15 @@ async def create_offer(db: AsyncSession, title: str, description: str|None,
             insert(offer_category).values(offer_id=offer.id, category_id=catid)
         )
 
+    await shift_offers_count(db, City, cities_ids, 1)
+    await shift_offers_count(db, Category, categories_ids, 1)
+
+    await versions.bump(db, "offers")
     try:
         await db.commit()
+        versions.invalidate("offers")
+        refdata.cities.bump()
+        refdata.categories.bump()
         await db.refresh(offer)
         return offer
     except IntegrityError:
@@ -232,20 +301,35 @@ async def create_offer(db: AsyncSession, title: str, description: str|None,
 
 async def get_offers_by_title(
     db: AsyncSession,
-    title_substr: str
+    title_substr: str,
+    limit: int = SEARCH_LIMIT_DEFAULT,
+    after: str | None = None
 ) -> List[Offer]:
+    # title уникален, поэтому годится как keyset-курсор
     stmt = (
         select(Offer)
         .where(Offer.title.ilike(f"%{title_substr}%"))
         .order_by(Offer.title)
     )
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    if after is not None:
+        stmt = stmt.where(Offer.title > after)
+    return await stream_page(db, stmt, limit)
 
 async def delete_offer(db: AsyncSession, offer_id: int) -> int:
+    # связи удалятся каскадом, поэтому счётчики уменьшаем до удаления
+    await shift_offers_count(
+        db, City, select(offer_city.c.city_id).where(offer_city.c.offer_id == offer_id), -1
+    )
+    await shift_offers_count(
+        db, Category, select(offer_category.c.category_id).where(offer_category.c.offer_id == offer_id), -1
+    )
     result = await db.execute(delete(Offer).where(Offer.id == offer_id))
     count = count_affected(result)
+    await versions.bump(db, "offers")
     await db.commit()
+    versions.invalidate("offers")
+    refdata.cities.bump()
+    refdata.categories.bump()
     return count
 
 # --- Статистика ---
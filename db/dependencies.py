@@ -2,16 +2,15 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 import uuid
 from fastapi import Depends, Request, Response
-from jose import JWTError, jwt
 from sqlalchemy.exc import IntegrityError
 from db.crud import create_user
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.base import get_db
+from db.base import get_db, get_read_db, AsyncSessionLocal
 from core.security import decode_access_token, create_access_token
+from core.metrics import ANON_USERS
 from db.models import User, RoleEnum
 from db.crud import get_user_by_username
 
@@ -78,6 +77,7 @@ async def get_or_create_user(
         anon_username = f"anon_{uuid.uuid4()}"
         anon_password = uuid.uuid4().hex
         new_user = await create_user(db, anon_username, anon_password, RoleEnum.user)
+        ANON_USERS.inc()
         access_token = create_access_token({"sub": new_user.username, "role": new_user.role.value})
         return {"user": new_user, "token": access_token}
     return None
@@ -98,3 +98,16 @@ async def get_current_superadmin_user(current_user: User = Depends(get_current_u
             detail="Недостаточно прав (требуются права super)",
         )
     return current_user
+
+async def is_superadmin_token(token: str) -> bool:
+    """
+    Проверка токена вне FastAPI-зависимостей (для middleware):
+    те же get_current_user и get_current_superadmin_user.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await get_current_user(token, db)
+            await get_current_superadmin_user(user)
+        except HTTPException:
+            return False
+    return True
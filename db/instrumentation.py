@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.metrics import DB_STATEMENTS, DB_TIME
+from core.settings import settings
+
+logger = logging.getLogger("db.sql")
+
+# после скольких запросов к БД за один HTTP-запрос пишем предупреждение (N+1)
+SQL_STATEMENT_WARN = settings.sql_statement_warn
+# журнал медленных запросов: порог в мс, 0 - выключен
+SLOW_QUERY_MS = settings.slow_query_ms
+# EXPLAIN (ANALYZE, BUFFERS) для медленных SELECT - не чаще раза в столько секунд
+SLOW_QUERY_EXPLAIN_INTERVAL = settings.slow_query_explain_interval
+SLOW_QUERY_KEEP = settings.slow_query_keep
+
+
+class QueryStats:
+    __slots__ = ("scope", "count", "total", "slowest", "slowest_sql")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ""
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration > self.slowest:
+            self.slowest = duration
+            self.slowest_sql = statement
+
+
+# статистика текущего HTTP-запроса; None - запрос к БД вне HTTP (lifespan, фоновые задачи)
+current_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+# накопленные итоги по маршрутам для /internal/sql
+route_totals: dict[str, dict] = {}
+
+# последние медленные запросы для /internal/slow-queries
+slow_queries: deque[dict] = deque(maxlen=SLOW_QUERY_KEEP)
+_async_engines: dict = {}
+_explain_state = {"last": 0.0, "running": False}
+_explain_tasks: set[asyncio.Task] = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    if conn.info.get("explain"):
+        # наш же EXPLAIN медленного запроса: не считаем и не журналируем
+        return
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if SLOW_QUERY_MS and duration * 1000 >= SLOW_QUERY_MS:
+        _record_slow(conn, statement, parameters, duration, executemany, stats)
+
+
+def _route_key(scope) -> str:
+    route = scope.get("route")
+    # сырой path не берём: у ненайденных маршрутов он произвольный
+    return f"{scope['method']} {route.path}" if route is not None else "unmatched"
+
+
+def _record_slow(conn, statement: str, parameters, duration: float, executemany: bool, stats: QueryStats | None):
+    is_select = statement.lstrip()[:6].upper() == "SELECT"
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "route": _route_key(stats.scope) if stats is not None and stats.scope is not None else None,
+        "duration_ms": round(duration * 1000, 3),
+        "sql": statement,
+        # параметры INSERT/UPDATE - данные пользователей (hashed_password и т.п.): не храним и не логируем
+        "params": repr(parameters)[:1000] if is_select else None,
+        "plan": None,
+    }
+    slow_queries.append(entry)
+    logger.warning(
+        "Медленный запрос %.1f ms (%s): %s; параметры: %s",
+        entry["duration_ms"], entry["route"] or "-", " ".join(statement.split())[:500], (entry["params"] or "-")[:300],
+    )
+    if executemany or not is_select or " FOR UPDATE" in statement.upper():
+        return
+    if conn.engine.dialect.name != "postgresql" or conn.engine not in _async_engines:
+        return
+    now = time.monotonic()
+    if _explain_state["running"] or now - _explain_state["last"] < SLOW_QUERY_EXPLAIN_INTERVAL:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _explain_state["last"] = now
+    _explain_state["running"] = True
+    task = loop.create_task(_explain(_async_engines[conn.engine], entry, statement, parameters))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def _explain(engine: AsyncEngine, entry: dict, statement: str, parameters):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) на отдельном соединении, в откатываемой транзакции:
+    ANALYZE выполняет запрос заново.
+    """
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            raw.info["explain"] = True
+            try:
+                result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                entry["plan"] = "\n".join(row[0] for row in result)
+            finally:
+                raw.info["explain"] = False
+                await conn.rollback()
+    except Exception as exc:
+        entry["plan"] = f"EXPLAIN не выполнен: {exc!r}"
+        logger.exception("EXPLAIN медленного запроса не выполнен")
+    finally:
+        _explain_state["running"] = False
+
+
+def instrument_engine(engine: AsyncEngine):
+    _async_engines[engine.sync_engine] = engine
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _finish(scope, stats: QueryStats):
+    key = _route_key(scope)
+    totals = route_totals.get(key)
+    if totals is None:
+        totals = route_totals[key] = {"requests": 0, "statements": 0, "db_time_ms": 0.0, "max_statements": 0}
+    totals["requests"] += 1
+    totals["statements"] += stats.count
+    totals["db_time_ms"] += stats.total * 1000
+    if stats.count > totals["max_statements"]:
+        totals["max_statements"] = stats.count
+    route_label = key.split(" ", 1)[-1]
+    DB_STATEMENTS.labels(route_label).observe(stats.count)
+    DB_TIME.labels(route_label).observe(stats.total)
+    if stats.count > SQL_STATEMENT_WARN:
+        logger.warning(
+            "%s: %d SQL-запросов за один HTTP-запрос (%.1f ms), самый долгий %.1f ms: %s",
+            key, stats.count, stats.total * 1000, stats.slowest * 1000, " ".join(stats.slowest_sql.split())[:200]
+        )
+
+
+class SQLTimingMiddleware:
+    """
+    Чистый ASGI middleware: считает запросы к БД за HTTP-запрос
+    и отдаёт их в заголовке Server-Timing.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stats.count:
+                header = (
+                    f'db;dur={stats.total * 1000:.1f};desc="{stats.count} queries", '
+                    f'db-slowest;dur={stats.slowest * 1000:.1f}'
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+            _finish(scope, stats)
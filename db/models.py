@@ -53,6 +53,8 @@ class City(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    # денормализованный счётчик связей в offer_city, ведётся в crud (см. recount_offers)
+    offers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -75,6 +77,8 @@ class Category(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
     imageUrl: Mapped[str] = mapped_column(String(200), nullable=False)
+    # денормализованный счётчик связей в offer_category
+    offers_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -142,3 +146,14 @@ class Stat(Base):
 
     user: Mapped["User"] = relationship(back_populates="stats")
     offer: Mapped["Offer"] = relationship()
+
+
+class DataVersion(Base):
+    """
+    Версии данных для ETag: общие для всех воркеров и хостов,
+    поднимаются функциями записи в crud в той же транзакции.
+    """
+    __tablename__ = "data_versions"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
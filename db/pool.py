@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+
+class PoolWaitStats:
+    """
+    Сколько раз и как долго запросы ждали соединение из пула.
+    """
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_checkout(self):
+        self.checkouts += 1
+
+    def record_wait(self, wait: float):
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "wait_total_ms": round(self.total_wait * 1000, 3),
+            "wait_avg_ms": round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class _TimedQueue(AsyncAdaptedQueue):
+    # get() блокируется, пока в пуле нет свободного соединения - это и меряем;
+    # connect нового соединения сюда не входит.
+    # Публичного события "начал ждать" у пула нет, поэтому очередь подменяется через
+    # _queue_class - внутренность SQLAlchemy: версия закреплена в requirements.txt,
+    # а TimedQueuePool падает при создании, если подмена не сработала
+    wait_stats: PoolWaitStats
+
+    def get(self, block: bool = True, timeout: float | None = None):
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            self.wait_stats.record_wait(time.perf_counter() - started)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    _queue_class = _TimedQueue
+    wait_stats: PoolWaitStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not isinstance(self._pool, _TimedQueue):
+            raise RuntimeError("TimedQueuePool: очередь пула не подменилась - несовместимая версия SQLAlchemy")
+        self._set_stats(PoolWaitStats())
+        # выдачи считает публичное событие checkout: одно на checkout, сколько бы
+        # попыток ни сделал пул внутри. recreate() передаёт слушателей старого пула
+        # в _dispatch (они пишут в те же общие wait_stats) - второй не нужен
+        if "_dispatch" not in kwargs:
+            event.listen(self, "checkout", self._on_checkout)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.wait_stats.record_checkout()
+
+    def _set_stats(self, stats: PoolWaitStats):
+        self.wait_stats = self._pool.wait_stats = stats
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._set_stats(self.wait_stats)
+        return pool
+
+
+async def warmup_pool(engine: AsyncEngine, connections: int):
+    """
+    Заранее открывает connections соединений, чтобы первые запросы не платили за connect.
+    Не больше pool_size: соединения держатся до конца прогрева, и лишние ждали бы
+    освобождения до pool_timeout.
+    """
+    pool = engine.sync_engine.pool
+    if isinstance(pool, QueuePool):
+        connections = min(connections, pool.size())
+    if connections <= 0:
+        return
+    conns = await asyncio.gather(*(engine.connect() for _ in range(connections)))
+    for conn in conns:
+        await conn.close()
+
+
+def get_pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.sync_engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.wait_stats.as_dict())
+    return stats
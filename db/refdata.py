@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import time
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from core.compression import PrecompressedBody
+from core.settings import settings
+from core.metrics import CACHE_REQUESTS
+from core.responses import dumps
+from db.models import City, Category
+from schemas.category import CategoryRead
+from schemas.city import CityRead
+
+# Снимок в памяти воркера для маленьких и редко меняющихся справочников.
+# Запись в этом же воркере поднимает версию -> следующий запрос перечитает таблицу.
+# Записи из других воркеров подхватываются не позже чем через REFDATA_TTL секунд
+# (так же ограничено и отставание, если снимок перечитан с реплики).
+REFDATA_TTL = settings.refdata_ttl
+# сколько клиенту можно держать справочник без перепроверки
+REFDATA_MAX_AGE = settings.refdata_max_age
+
+
+class RefSnapshot:
+    # элементы хранятся уже готовыми к JSON dict-ами схемы (schema.dump_orm)
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self.items: list[dict] = []            # в порядке id, как отдавал select(Model)
+        self.items_json = b"[]"                # items, сериализованные один раз на загрузку
+        self.body = PrecompressedBody(self.items_json)  # плюс сжатые варианты items_json
+        self._hits = CACHE_REQUESTS.labels(f"refdata_{model.__tablename__}", "hit")
+        self._reloads = CACHE_REQUESTS.labels(f"refdata_{model.__tablename__}", "reload")
+        # хэш items_json: одинаков на всех воркерах, пока не изменились данные
+        self.etag = ""
+        self._by_name: list[dict] = []         # отсортированы по имени
+        self._keys: list[str] = []             # name.casefold() в том же порядке, что _by_name
+        self._order: list[tuple[str, str]] = []  # ключ сортировки (casefold, name)
+
+    def bump(self):
+        self.version += 1
+
+    def is_stale(self) -> bool:
+        return (
+            self._loaded_version != self.version
+            or time.monotonic() - self._loaded_at > REFDATA_TTL
+        )
+
+    async def refresh(self, db: AsyncSession):
+        async with self._lock:
+            if not self.is_stale():
+                # пока ждали lock, кто-то уже перечитал
+                return
+            version = self.version
+            result = await db.execute(select(self.model).order_by(self.model.id))
+            self.load([self.schema.dump_orm(obj) for obj in result.scalars().all()], version)
+
+    def load(self, items: list[dict], version: int | None = None):
+        items_json = dumps(items)
+        # тег, сжатые тела и индексы пересобираются, только если данные изменились
+        # (или это первая загрузка); иначе ETag у клиентов остаётся действительным
+        if items_json != self.items_json or not self.etag:
+            by_name = sorted(items, key=lambda item: (item["name"].casefold(), item["name"]))
+            self.items = items
+            self.items_json = items_json
+            self.body = PrecompressedBody(items_json)
+            digest = hashlib.blake2b(items_json, digest_size=8).hexdigest()
+            self.etag = f'W/"{self.model.__tablename__}-{digest}"'
+            self._by_name = by_name
+            self._order = [(item["name"].casefold(), item["name"]) for item in by_name]
+            self._keys = [key for key, _ in self._order]
+        self._loaded_version = self.version if version is None else version
+        self._loaded_at = time.monotonic()
+
+    async def ensure_fresh(self, db: AsyncSession):
+        if self.is_stale():
+            self._reloads.inc()
+            await self.refresh(db)
+        else:
+            self._hits.inc()
+
+    async def get_all_body(self, db: AsyncSession) -> PrecompressedBody:
+        await self.ensure_fresh(db)
+        return self.body
+
+    def search(self, substr: str, limit: int, after: str | None = None) -> list[dict]:
+        """
+        Аналог ILIKE '%substr%' ORDER BY name с keyset-курсором по имени.
+        """
+        needle = substr.casefold()
+        start = 0
+        if after is not None:
+            start = bisect_right(self._order, (after.casefold(), after))
+        found: list[dict] = []
+        for i in range(start, len(self._keys)):
+            if needle in self._keys[i]:
+                found.append(self._by_name[i])
+                if len(found) >= limit:
+                    break
+        return found
+
+    def autocomplete(self, prefix: str, limit: int) -> list[dict]:
+        """
+        Сначала совпадения по префиксу (бинарный поиск), затем по подстроке.
+        """
+        needle = prefix.casefold()
+        found: list[dict] = []
+        i = bisect_left(self._keys, needle)
+        while i < len(self._keys) and self._keys[i].startswith(needle) and len(found) < limit:
+            found.append(self._by_name[i])
+            i += 1
+        if len(found) < limit:
+            for key, item in zip(self._keys, self._by_name):
+                if needle in key and not key.startswith(needle):
+                    found.append(item)
+                    if len(found) >= limit:
+                        break
+        return found
+
+
+cities = RefSnapshot(City, CityRead)
+categories = RefSnapshot(Category, CategoryRead)
+
+
+async def load_all(db: AsyncSession):
+    for snapshot in (cities, categories):
+        await snapshot.refresh(db)
+
@@ -0,0 +1,72 @@
+import time
+
+from sqlalchemy import insert, inspect, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from core.settings import settings
+from db.models import DataVersion
+
+# Версии для ETag хранятся в таблице data_versions, поэтому неизменные данные
+# имеют один и тот же тег на любом воркере и после перезапуска.
+# Воркер перечитывает версию не чаще раза в OFFERS_ETAG_TTL секунд, а после
+# своей записи (invalidate) - сразу.
+
+# запись в ленту, сделанная другим воркером, станет видна по ETag не позже чем через столько секунд
+OFFERS_ETAG_TTL = settings.offers_etag_ttl
+
+# name -> (версия, time.monotonic() момента чтения)
+_cached: dict[str, tuple[int, float]] = {}
+
+
+async def create_table(engine: AsyncEngine):
+    """
+    Миграций в проекте нет, а create_all на рабочей базе не запускается:
+    таблицу data_versions создаёт при старте сам воркер, если её ещё нет.
+    """
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(CreateTable(DataVersion.__table__, if_not_exists=True))
+    except DBAPIError:
+        # воркеры стартуют одновременно: IF NOT EXISTS в Postgres не спасает от гонки двух CREATE
+        async with engine.connect() as conn:
+            if not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(DataVersion.__tablename__)):
+                raise
+
+
+async def bump(db: AsyncSession, name: str):
+    """
+    Поднимает версию в текущей транзакции; после commit - invalidate(name).
+    """
+    stmt = update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+    result = await db.execute(stmt)
+    if result.rowcount:
+        return
+    # первая запись - строки ещё нет; если её только что вставил другой воркер - повторяем UPDATE
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(DataVersion).values(name=name, version=1))
+    except IntegrityError:
+        await db.execute(stmt)
+
+
+def invalidate(name: str | None = None):
+    if name is None:
+        _cached.clear()
+    else:
+        _cached.pop(name, None)
+
+
+async def get(db: AsyncSession, name: str) -> int:
+    cached = _cached.get(name)
+    now = time.monotonic()
+    if cached is not None and now - cached[1] < OFFERS_ETAG_TTL:
+        return cached[0]
+    version = await db.scalar(select(DataVersion.version).where(DataVersion.name == name)) or 0
+    _cached[name] = (version, now)
+    return version
+
+
+async def offers_etag(db: AsyncSession) -> str:
+    return f'W/"offers-{await get(db, "offers")}"'
@@ -1,13 +1,26 @@
 from contextlib import asynccontextmanager
 import logging
-import uvicorn
-import json
 import asyncio
-from aiokafka import AIOKafkaConsumer
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from db.base import engine, Base, create_database
-from typing import List
+from db.base import engine, Base, create_database, AsyncSessionLocal, DB_POOL_WARMUP, replica_engine, \
+    mark_replica_down, session_stats
+from db.pool import warmup_pool, get_pool_stats
+from db.instrumentation import instrument_engine, SQLTimingMiddleware, route_totals, slow_queries
+from db import refdata, versions
+from core import security
+from core.responses import FastJSONResponse, dumps
+from core.settings import settings
+from core.compression import CompressionMiddleware
+from core.events import decode_event
+from core.event_ring import EventRing, HostLock, default_ring_path
+from core.metrics import (
+    MetricsMiddleware, KAFKA_MESSAGES, KAFKA_LAG, register_pool_collector, render_latest,
+    refresh_pool_gauges_loop, mark_worker_dead,
+)
+from core.profiling import ProfilingMiddleware, list_profiles as list_saved_profiles, load_folded
+from db.dependencies import get_current_superadmin_user, is_superadmin_token
 
 
 
@@ -17,43 +30,120 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
 
-# буфер последних сообщений
-_events_buffer: List[dict] = []
-BUFFER_SIZE = 5  # сколько последних событий держим
+# буфер последних сообщений: общий для воркеров хоста, пишет один консьюмер
+BUFFER_SIZE = settings.kafka_buffer_size  # сколько последних событий держим
+KAFKA_RING_PATH = settings.kafka_ring_path or default_ring_path()
+KAFKA_RING_SLOT_SIZE = settings.kafka_ring_slot_size
+# как часто не-ведущий воркер пробует стать консьюмером (если ведущий умер)
+KAFKA_LEADER_RETRY = settings.kafka_leader_retry
+_events_ring: EventRing | None = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup: ---
-    consumer = AIOKafkaConsumer(
-        "ad-events.ad-events",
-        bootstrap_servers="localhost:9092",
-        group_id="mobile-proxy-group",
-        auto_offset_reset="latest",
-    )
-    await consumer.start()
-#
-    async def consume_loop():
+    # aiokafka нужен только консьюмеру - не платим за его импорт при import main
+    from aiokafka import AIOKafkaConsumer, TopicPartition
+
+    # bcrypt и jose - до первого логина; хотя бы одно соединение - инициализация диалекта
+    security.warmup()
+    await warmup_pool(engine, max(1, DB_POOL_WARMUP))
+    if replica_engine is not None:
+        try:
+            await warmup_pool(replica_engine, DB_POOL_WARMUP)
+        except Exception:
+            logger.exception("Реплика недоступна, чтение идёт с основной БД")
+            mark_replica_down()
+    # версии для ETag ленты - таблица, которой нет в базах, созданных до неё
+    await versions.create_table(engine)
+    # справочники городов и категорий держим в памяти воркера
+    async with AsyncSessionLocal() as db:
+        await refdata.load_all(db)
+
+    global _events_ring
+    _events_ring = ring = EventRing(KAFKA_RING_PATH, BUFFER_SIZE, KAFKA_RING_SLOT_SIZE)
+    # консьюмер - один на хост: у кого блокировка, тот и читает Kafka
+    leader = HostLock(f"{ring.path}.lock")
+
+    async def consume_loop(consumer: AIOKafkaConsumer):
         async for msg in consumer:
+            highwater = consumer.highwater(TopicPartition(msg.topic, msg.partition))
+            if highwater is not None:
+                KAFKA_LAG.labels(msg.topic, str(msg.partition)).set(highwater - msg.offset - 1)
             try:
-                evt = json.loads(msg.value.decode())
+                evt = decode_event(msg.value)
             except:
+                KAFKA_MESSAGES.labels(msg.topic, "decode_error").inc()
                 continue
-            _events_buffer.append(evt)
-            if len(_events_buffer) > BUFFER_SIZE:
-                _events_buffer.pop(0)
+            if not ring.append(dumps(evt)):
+                KAFKA_MESSAGES.labels(msg.topic, "too_large").inc()
+                continue
+            KAFKA_MESSAGES.labels(msg.topic, "ok").inc()
+
+    async def lead_consumer():
+        while True:
+            if not leader.try_acquire():
+                await asyncio.sleep(KAFKA_LEADER_RETRY)
+                continue
+            consumer = AIOKafkaConsumer(
+                settings.kafka_topic,
+                bootstrap_servers=settings.kafka_bootstrap_servers,
+                group_id=settings.kafka_group_id,
+                auto_offset_reset="latest",
+            )
+            try:
+                await consumer.start()
+                await consume_loop(consumer)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Консьюмер Kafka упал, перезапуск через %s с", KAFKA_LEADER_RETRY)
+                # отдаём блокировку: консьюмером может стать другой воркер
+                leader.release()
+                await asyncio.sleep(KAFKA_LEADER_RETRY)
+            finally:
+                await consumer.stop()
 
     # в фоне
-    asyncio.create_task(consume_loop())
+    consume_task = asyncio.create_task(lead_consumer())
+    # несколько воркеров: состояние пулов - в multiprocess-гаужи
+    pool_gauges_task = asyncio.create_task(refresh_pool_gauges_loop())
     #pass
     yield
-    # --- Shutdown: ---
+    # --- Shutdown: --- (текущие запросы uvicorn уже дождался)
+    for task in (consume_task, pool_gauges_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    mark_worker_dead()
+    leader.release()
+    ring.close()
+    _events_ring = None
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 app = FastAPI(
     title="Ad Service API",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+# --- Учёт SQL-запросов по HTTP-запросам ---
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+app.add_middleware(SQLTimingMiddleware)
+# gzip/br по Accept-Encoding; закэшированные тела приходят уже сжатыми
+app.add_middleware(CompressionMiddleware)
+# --- Метрики Prometheus ---
+app.add_middleware(MetricsMiddleware)
+register_pool_collector({"primary": engine, "replica": replica_engine}, get_pool_stats)
+# --- Профилирование по заголовку X-Profile (суперадмин) или доле PROFILE_SAMPLE_RATE ---
+app.add_middleware(ProfilingMiddleware, authorize=is_superadmin_token)
+
 # --- Global CORS ---
 app.add_middleware(
     CORSMiddleware,
@@ -72,8 +162,47 @@ app.include_router(offers.router)
 
 @app.get("/api/kafka/events")
 async def get_events():
-    return {"events": list(_events_buffer)}
+    if _events_ring is None:
+        return {"events": []}
+    return Response(content=_events_ring.json_body(), media_type="application/json")
+
+@app.get("/internal/pool", include_in_schema=False)
+async def get_pool(current_admin=Depends(get_current_superadmin_user)):
+    return {
+        "primary": get_pool_stats(engine),
+        "replica": get_pool_stats(replica_engine) if replica_engine is not None else None,
+        "sessions": dict(session_stats),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
+@app.get("/internal/sql", include_in_schema=False)
+async def get_sql_stats(current_admin=Depends(get_current_superadmin_user)):
+    return route_totals
+
+@app.get("/internal/slow-queries", include_in_schema=False)
+async def get_slow_queries(current_admin=Depends(get_current_superadmin_user)):
+    # новые сверху; plan появляется, когда отработает фоновый EXPLAIN
+    return list(reversed(slow_queries))
+
+@app.get("/internal/profiles", include_in_schema=False)
+async def list_profiles(current_admin=Depends(get_current_superadmin_user)):
+    # профили всех воркеров хоста - из PROFILE_DIR
+    return await asyncio.to_thread(list_saved_profiles)
+
+@app.get("/internal/profiles/{profile_id}", include_in_schema=False, response_class=PlainTextResponse)
+async def get_profile(profile_id: str, current_admin=Depends(get_current_superadmin_user)):
+    folded = await asyncio.to_thread(load_folded, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    # формат folded stacks: flamegraph.pl или speedscope
+    return folded
 
 if __name__ == "__main__":
+    # для разработки; в проде - python serve.py
+    import uvicorn
     #asyncio.run(create_database())
     uvicorn.run("main:app", host="0.0.0.0", port=3826, reload=True)
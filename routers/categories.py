@@ -1,20 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from typing import List
+from typing import List, Optional
 
-from db.dependencies import get_db, get_current_admin_user, get_current_superadmin_user
-from db.crud import get_all_categories, create_category, delete_category, get_categories_by_name
+from db.dependencies import get_db, get_read_db, get_current_admin_user, get_current_superadmin_user
+from core.etag import etag_matches, not_modified
+from core.responses import FastJSONResponse
+from db import refdata
+from db.crud import create_category, delete_category, \
+    SEARCH_LIMIT_DEFAULT, SEARCH_LIMIT_MAX, encode_cursor, decode_cursor
 from schemas.category import CategoryCreate, CategoryRead
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
 
 @router.get("/", response_model=List[CategoryRead], summary="Получение списка всех категорий")
-async def read_categories(db: AsyncSession = Depends(get_db)):
-    categories = await get_all_categories(db)
-    return categories
+async def read_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # список сериализован (и сжат) заранее, при загрузке снимка
+    body = await refdata.categories.get_all_body(db)
+    etag = refdata.categories.etag
+    headers = {"etag": etag, "cache-control": f"public, max-age={refdata.REFDATA_MAX_AGE}"}
+    if etag_matches(request, etag):
+        return not_modified(etag, headers)
+    return body.response(request.headers.get("accept-encoding"), headers)
 
 
 @router.post("/", response_model=CategoryRead, status_code=status.HTTP_201_CREATED, summary="Добавление новой категории")
@@ -61,9 +70,35 @@ async def delete_category_rout(
 )
 async def search_categories(
     title: str = Query(..., min_length=1, description="Подстрока в имени категории"),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(SEARCH_LIMIT_DEFAULT, ge=1, le=SEARCH_LIMIT_MAX),
+    after: Optional[str] = Query(None, description="Курсор из заголовка x-next-cursor"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    cats = await get_categories_by_name(db, title)
+    try:
+        after_value = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    await refdata.categories.ensure_fresh(db)
+    # лишний элемент - только признак следующей страницы, в ответ не попадает
+    cats = refdata.categories.search(title, limit + 1, after_value)
     if not cats:
         raise HTTPException(status_code=404, detail="Категории не найдены")
-    return cats
\ No newline at end of file
+    headers = {}
+    if len(cats) > limit:
+        cats = cats[:limit]
+        headers["x-next-cursor"] = encode_cursor(cats[-1]["name"])
+    return FastJSONResponse(content=cats, headers=headers)
+
+@router.get(
+    "/autocomplete",
+    response_model=List[CategoryRead],
+    summary="Автодополнение категорий по префиксу (из памяти)",
+    status_code=status.HTTP_200_OK
+)
+async def autocomplete_categories(
+    q: str = Query(..., min_length=1, description="Начало или часть имени"),
+    limit: int = Query(10, ge=1, le=SEARCH_LIMIT_MAX),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await refdata.categories.ensure_fresh(db)
+    return FastJSONResponse(content=refdata.categories.autocomplete(q, limit))
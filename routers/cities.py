@@ -1,20 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from typing import List
+from typing import List, Optional
 
-from db.dependencies import get_db, get_current_active_user, get_current_admin_user, get_current_superadmin_user
-from db.crud import get_all_cities, create_city, delete_city, get_cities_by_name
+from db.dependencies import get_db, get_read_db, get_current_active_user, get_current_admin_user, get_current_superadmin_user
+from core.etag import etag_matches, not_modified
+from core.responses import FastJSONResponse
+from db import refdata
+from db.crud import create_city, delete_city, \
+    SEARCH_LIMIT_DEFAULT, SEARCH_LIMIT_MAX, encode_cursor, decode_cursor
 from schemas.city import CityCreate, CityRead
 
 router = APIRouter(prefix="/api/cities", tags=["cities"])
 
 
 @router.get("/", response_model=List[CityRead], summary="Получение списка всех городов")
-async def read_cities(db: AsyncSession = Depends(get_db)):
-    cities = await get_all_cities(db)
-    return cities
+async def read_cities(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # список сериализован (и сжат) заранее, при загрузке снимка
+    body = await refdata.cities.get_all_body(db)
+    etag = refdata.cities.etag
+    headers = {"etag": etag, "cache-control": f"public, max-age={refdata.REFDATA_MAX_AGE}"}
+    if etag_matches(request, etag):
+        return not_modified(etag, headers)
+    return body.response(request.headers.get("accept-encoding"), headers)
 
 
 @router.post("/", response_model=CityRead, status_code=status.HTTP_201_CREATED, summary="Добавление нового города")
@@ -61,9 +70,35 @@ async def delete_city_rout(
 )
 async def search_cities(
     title: str = Query(..., min_length=1, description="Подстрока в имени города"),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(SEARCH_LIMIT_DEFAULT, ge=1, le=SEARCH_LIMIT_MAX),
+    after: Optional[str] = Query(None, description="Курсор из заголовка x-next-cursor"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    cities = await get_cities_by_name(db, title)
+    try:
+        after_value = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    await refdata.cities.ensure_fresh(db)
+    # лишний элемент - только признак следующей страницы, в ответ не попадает
+    cities = refdata.cities.search(title, limit + 1, after_value)
     if not cities:
         raise HTTPException(status_code=404, detail="Города не найдены")
-    return cities
\ No newline at end of file
+    headers = {}
+    if len(cities) > limit:
+        cities = cities[:limit]
+        headers["x-next-cursor"] = encode_cursor(cities[-1]["name"])
+    return FastJSONResponse(content=cities, headers=headers)
+
+@router.get(
+    "/autocomplete",
+    response_model=List[CityRead],
+    summary="Автодополнение городов по префиксу (из памяти)",
+    status_code=status.HTTP_200_OK
+)
+async def autocomplete_cities(
+    q: str = Query(..., min_length=1, description="Начало или часть имени"),
+    limit: int = Query(10, ge=1, le=SEARCH_LIMIT_MAX),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await refdata.cities.ensure_fresh(db)
+    return FastJSONResponse(content=refdata.cities.autocomplete(q, limit))
@@ -1,14 +1,17 @@
 import json
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from fastapi.responses import JSONResponse
-from db.dependencies import get_db, get_current_active_user, get_current_admin_user, get_or_create_user, \
+from core.etag import etag_matches, not_modified
+from core.responses import FastJSONResponse
+from core.security import decode_access_token
+from db import versions
+from db.dependencies import get_db, get_read_db, get_current_active_user, get_current_admin_user, get_or_create_user, \
     get_current_superadmin_user
 from db.crud import get_offers_by_city_and_category, create_offer, log_stat, delete_offer, add_city_to_offer, \
-    remove_city_from_offer, get_offers_by_title
+    remove_city_from_offer, get_offers_by_title, recount_offers, SEARCH_LIMIT_DEFAULT, SEARCH_LIMIT_MAX, encode_cursor, decode_cursor
 from schemas.category import CategoryRead
 from schemas.offer import OfferCreate, OfferRead
 from db.models import Offer, User
@@ -18,15 +21,30 @@ router = APIRouter(prefix="/api/offers", tags=["offers"])
 
 @router.get("/", response_model=List[OfferRead], summary="Получение рекламных предложений")
 async def read_offers(
+        request: Request,
         authorization: Optional[str] = Header(None, alias="Authorization"),
         offset: int = Query(0, ge=0),
         city_id: Optional[int] = None,
         category_id: Optional[int] = None,
         db: AsyncSession = Depends(get_db),
+        read_db: AsyncSession = Depends(get_read_db),
 ):
     """
     Если пользователь авторизован иначе создаём анонимуса
     """
+    # лента не зависит от пользователя: клиенту с действующим токеном и
+    # совпавшим ETag отвечаем 304 без выборки ленты и сериализации
+    # (версия читается из БД не чаще раза в OFFERS_ETAG_TTL). Версия - из той же
+    # базы, что и лента, до её выборки: отставшая реплика не сочетает новый тег со старыми данными
+    etag = await versions.offers_etag(read_db)
+    cache_headers = {"etag": etag, "cache-control": "private, no-cache"}
+    if authorization and etag_matches(request, etag):
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and decode_access_token(token).get("sub"):
+            return not_modified(etag, cache_headers)
+
+    # пользователь (и создание анонимуса) - только на основной БД,
+    # иначе токен только что созданного анонимуса может не найтись на реплике
 
     current_user_data = await get_or_create_user(authorization=authorization, db=db)
 
@@ -40,26 +58,22 @@ async def read_offers(
         send_token = False
 
     limit = 5
-    offers = await get_offers_by_city_and_category(db, city_id, category_id, limit=limit, offset=offset)
+    offers = await get_offers_by_city_and_category(read_db, city_id, category_id, limit=limit, offset=offset)
 
     # Логируем статистику: для каждого предложения делаем запись
     #for offer in offers:
     #    await log_stat(db, current_user.id, offer.id)
 
-    response_offers: list[OfferRead] = []
-    for offer_obj in offers:
-        offer_data = OfferRead.model_validate(offer_obj)
-        offer_data.category_id = category_id
-        offer_data.city_id = city_id
-        #if category_obj:
-        #    offer_data.category = CategoryRead.model_validate(category_obj)
-        response_offers.append(offer_data)
-    payload = [item.model_dump(mode="json") for item in response_offers]
+    # данные из нашей БД - без повторной валидации pydantic
+    payload = [
+        OfferRead.dump_orm(offer_obj, by_alias=False, city_id=city_id, category_id=category_id)
+        for offer_obj in offers
+    ]
     if send_token:
-        headers = {"x-access-token": new_token}
-        return JSONResponse(content=payload, headers=headers)
+        headers = {"x-access-token": new_token, **cache_headers}
+        return FastJSONResponse(content=payload, headers=headers)
 
-    return JSONResponse(content=payload)
+    return FastJSONResponse(content=payload, headers=cache_headers)
 
 
 @router.post("/", response_model=OfferRead, status_code=status.HTTP_201_CREATED, summary="Добавление нового предложения")
@@ -136,6 +150,15 @@ async def remove_city(
     except NoResultFound as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.post("/recount", status_code=status.HTTP_204_NO_CONTENT,
+             summary="Пересчитать offers_count у городов и категорий")
+async def recount_offers_rout(
+    db: AsyncSession = Depends(get_db),
+    current_admin=Depends(get_current_superadmin_user),
+):
+    await recount_offers(db)
+
+
 @router.get(
     "/search",
     response_model=List[OfferRead],
@@ -144,9 +167,20 @@ async def remove_city(
 )
 async def search_offers(
     title: str = Query(..., min_length=1, description="Подстрока в заголовке предложения"),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(SEARCH_LIMIT_DEFAULT, ge=1, le=SEARCH_LIMIT_MAX),
+    after: Optional[str] = Query(None, description="Курсор из заголовка x-next-cursor"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    offers = await get_offers_by_title(db, title)
+    try:
+        after_value = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+    # лишняя строка - только признак следующей страницы, в ответ не попадает
+    offers = await get_offers_by_title(db, title, limit=limit + 1, after=after_value)
     if not offers:
         raise HTTPException(status_code=404, detail="Предложения не найдены")
-    return offers
\ No newline at end of file
+    headers = {}
+    if len(offers) > limit:
+        offers = offers[:limit]
+        headers["x-next-cursor"] = encode_cursor(offers[-1].title)
+    return FastJSONResponse(content=[OfferRead.dump_orm(o) for o in offers], headers=headers)
\ No newline at end of file
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field, HttpUrl
 
+from schemas.fast import FastDumpMixin
+
 
 class CategoryBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -10,8 +12,9 @@ class CategoryCreate(CategoryBase):
     pass
 
 
-class CategoryRead(CategoryBase):
+class CategoryRead(FastDumpMixin, CategoryBase):
     id: int
+    offers_count: int = 0
 
     model_config = {
         "from_attributes": True,
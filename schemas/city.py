@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from schemas.fast import FastDumpMixin
+
 
 class CityBase(BaseModel):
     name: str
@@ -9,8 +11,9 @@ class CityCreate(CityBase):
     pass
 
 
-class CityRead(CityBase):
+class CityRead(FastDumpMixin, CityBase):
     id: int
+    offers_count: int = 0
 
     model_config = {
         "populate_by_name": True,
@@ -5,6 +5,7 @@ from typing import Optional
 
 from schemas.category import CategoryRead
 from schemas.city import CityRead
+from schemas.fast import FastDumpMixin
 
 
 class OfferBase(BaseModel):
@@ -21,7 +22,7 @@ class OfferCreate(OfferBase):
     categories_ids: list[int]
 
 
-class OfferRead(OfferBase):
+class OfferRead(FastDumpMixin, OfferBase):
     id: int
     created_at: datetime
 
@@ -0,0 +1,82 @@
+"""
+Запуск в проде: несколько воркеров uvicorn, uvloop/httptools, настройки
+keep-alive и backlog, плавная остановка по SIGTERM.
+
+    python serve.py
+
+Каждый воркер до приёма трафика проходит lifespan из main.py: прогрев пула
+соединений и загрузку справочников. Сокет слушает родительский процесс,
+поэтому входящие соединения ждут в backlog, пока воркер не прогреется.
+По SIGTERM uvicorn перестаёт принимать соединения, дожидается текущих
+запросов (не дольше WEB_GRACEFUL_TIMEOUT) и выполняет shutdown в lifespan.
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+from os import getenv
+
+import uvicorn
+
+from core.event_ring import RUN_PID_ENV
+from core.settings import settings
+
+WEB_HOST = settings.web_host
+WEB_PORT = settings.web_port
+# по умолчанию - воркер на ядро
+WEB_WORKERS = settings.web_workers
+# очередь ещё не принятых соединений (ограничена также net.core.somaxconn)
+WEB_BACKLOG = settings.web_backlog
+# больше таймаута простоя балансировщика (обычно 60 с), иначе он получает обрывы
+WEB_KEEPALIVE = settings.web_keepalive
+WEB_GRACEFUL_TIMEOUT = settings.web_graceful_timeout
+# сверх этого числа одновременных соединений воркер отвечает 503 (0 - без ограничения)
+WEB_LIMIT_CONCURRENCY = settings.web_limit_concurrency
+WEB_ACCESS_LOG = settings.web_access_log
+WEB_FORWARDED_ALLOW_IPS = settings.web_forwarded_allow_ips
+
+
+def _has(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def prepare_metrics_dir(workers: int):
+    """
+    Несколько воркеров: метрики prometheus_client пишутся в общий каталог,
+    /metrics любого воркера отдаёт сумму. Каталог очищается при каждом запуске.
+    """
+    if workers <= 1:
+        return
+    path = getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="ufanet-ads-metrics-")
+
+
+def main():
+    prepare_metrics_dir(WEB_WORKERS)
+    # поколение кольца событий (core/event_ring.py): воркеры этого запуска делят
+    # его содержимое, следующий запуск начнёт с пустого
+    os.environ[RUN_PID_ENV] = str(os.getpid())
+    uvicorn.run(
+        "main:app",
+        host=WEB_HOST,
+        port=WEB_PORT,
+        workers=WEB_WORKERS,
+        loop="uvloop" if _has("uvloop") else "asyncio",
+        http="httptools" if _has("httptools") else "h11",
+        backlog=WEB_BACKLOG,
+        timeout_keep_alive=WEB_KEEPALIVE,
+        timeout_graceful_shutdown=WEB_GRACEFUL_TIMEOUT,
+        limit_concurrency=WEB_LIMIT_CONCURRENCY,
+        access_log=WEB_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=WEB_FORWARDED_ALLOW_IPS,
+        lifespan="on",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import time
+from typing import Callable
+
+import httpx
+import pytest
+
+from Telegram_admin_panel.credentials import CredCache
+
+
+def auth_backend(tokens: dict[str, str], calls: list[str]) -> Callable[[httpx.Request], httpx.Response]:
+    """
+    /api/auth/me отдаёт роль по токену, 401 - на неизвестный токен; /api/cities/
+    тоже проверяет токен, как любой защищённый маршрут.
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in tokens:
+            return httpx.Response(401, json={"detail": "Not authenticated"})
+        if request.url.path == "/api/auth/me":
+            return httpx.Response(200, json={"role": tokens[token]})
+        return httpx.Response(200, json=[])
+
+    return handler
+
+
+@pytest.fixture
+def creds():
+    return CredCache(ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_role_is_cached_until_ttl(creds, monkeypatch, mock_backend):
+    calls = []
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    backend = mock_backend(auth_backend({"t1": "admin"}, calls))
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    assert calls == ["/api/auth/me"]
+
+    # другой токен того же пользователя (новый вход) проверяется заново
+    assert await creds.get_role(backend, 1, "t2") is None
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    assert len(calls) == 3
+
+    now += 61
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_401_drops_cached_token(creds, mock_backend):
+    calls = []
+    tokens = {"t1": "superadmin", "t2": "admin"}
+    # как в bot.py: 401 на любом ответе проходит через хук кэша
+    backend = mock_backend(auth_backend(tokens, calls), event_hooks={"response": [creds.drop_rejected]})
+    assert await creds.get_role(backend, 1, "t1") == "superadmin"
+    assert await creds.get_role(backend, 2, "t2") == "admin"
+
+    # токен отозван на сервере: 401 на любом запросе сбрасывает только его запись
+    del tokens["t1"]
+    r = await backend.get("/api/cities/", headers={"Authorization": "Bearer t1"})
+    assert r.status_code == 401
+    calls.clear()
+    assert await creds.get_role(backend, 1, "t1") is None
+    assert await creds.get_role(backend, 2, "t2") == "admin"
+    assert calls == ["/api/auth/me"]
+
+
+@pytest.mark.asyncio
+async def test_logout_forgets_role(creds, mock_backend):
+    calls = []
+    backend = mock_backend(auth_backend({"t1": "admin"}, calls))
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    creds.pop(1)
+    assert await creds.get_role(backend, 1, "t1") == "admin"
+    assert calls == ["/api/auth/me", "/api/auth/me"]
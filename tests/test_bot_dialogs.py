@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from Telegram_admin_panel.dialogs import DialogFlow
+from Telegram_admin_panel.store import ExpiringStore
+
+
+@pytest.fixture
+def flow(tmp_path):
+    flow = DialogFlow(ExpiringStore(str(tmp_path / "bot.sqlite3"), "dialogs", ttl=600, max_entries=100))
+
+    @flow.step("ask_name")
+    async def ask_name(d, text):
+        d.ctx["name"] = text
+        d.goto("ask_code")
+
+    @flow.step("ask_code", timeout=5, public=True)
+    async def ask_code(d, text):
+        d.ctx["code"] = text
+        d.finish()
+
+    return flow
+
+
+@pytest.mark.asyncio
+async def test_flow_dispatches_by_step(flow):
+    flow.begin(1, "ask_name", kind="city")
+
+    dialog, step = flow.resolve(1)
+    assert dialog.ctx == {"kind": "city"} and not step.public
+    await step.handler(dialog, "Уфа")
+
+    dialog, step = flow.resolve(1)
+    assert dialog.step == "ask_code" and dialog.ctx == {"kind": "city", "name": "Уфа"} and step.public
+    await step.handler(dialog, "42")
+    assert flow.resolve(1) is None
+
+
+def test_flow_step_timeout_frees_dialog(flow, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    dialog = flow.begin(1, "ask_name")
+    dialog.goto("ask_code")
+
+    # у шага ask_code свой таймаут - 5 секунд
+    now += 6
+    assert flow.resolve(1) is None
+    assert len(flow.store) == 0
+
+
+def test_flow_rejects_unknown_step(flow):
+    with pytest.raises(KeyError):
+        flow.begin(1, "no_such_step")
+    # состояние со шагом, которого больше нет в боте, забывается
+    flow.store.set(2, {"step": {"name": "removed_step"}, "ctx": {}})
+    assert flow.resolve(2) is None
+    assert flow.store.get(2) is None
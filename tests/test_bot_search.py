@@ -0,0 +1,87 @@
+from typing import Callable
+
+import httpx
+import pytest
+
+from Telegram_admin_panel.search import SearchPager, SEARCH_LIMIT_MAX, MESSAGE_MAX
+
+NAMES = [f"Город{i}" for i in range(4)]
+
+
+def cities_search(names: list[str], requests: list[dict]) -> Callable[[httpx.Request], httpx.Response]:
+    """
+    Поиск городов как на сервере: keyset по имени, x-next-cursor только если
+    есть следующая страница (курсор - индекс имени, боту его содержимое неважно).
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        requests.append(params)
+        limit = int(params["limit"])
+        if limit > SEARCH_LIMIT_MAX:
+            return httpx.Response(422)
+        after = int(params.get("after", -1))
+        rest = [n for i, n in enumerate(names) if params["title"] in n and i > after]
+        if not rest:
+            return httpx.Response(404, json={"detail": "Города не найдены"})
+        headers = {"x-next-cursor": str(names.index(rest[limit - 1]))} if len(rest) > limit else {}
+        page = [{"id": names.index(n) + 1, "name": n} for n in rest[:limit]]
+        return httpx.Response(200, json=page, headers=headers)
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_search_pager_next_prev(mock_backend):
+    requests = []
+    backend = mock_backend(cities_search(NAMES, requests))
+    pager = SearchPager(backend, page_size=3)
+    search = pager.new("/api/cities/search", "Город")
+    assert [i["name"] for i in await pager.fetch(search, "t")] == NAMES[:3]
+    assert search["next"]
+
+    # назад с первой страницы - некуда
+    assert await pager.turn(search, False, "t") is None
+
+    items = await pager.turn(search, True, "t")
+    assert [i["name"] for i in items] == NAMES[3:]
+    assert search["page"] == 1 and search["next"] is None
+    assert requests[-1]["after"] == "2"
+    # вперёд с последней страницы - некуда, запроса нет
+    assert await pager.turn(search, True, "t") is None
+    assert len(requests) == 2
+
+    items = await pager.turn(search, False, "t")
+    assert [i["name"] for i in items] == NAMES[:3]
+    assert search["page"] == 0 and "after" not in requests[-1]
+    assert search["cursors"] == [None, "2"]
+
+
+@pytest.mark.asyncio
+async def test_search_pager_empty_page_stays(mock_backend):
+    names = list(NAMES)
+    backend = mock_backend(cities_search(names, []))
+    pager = SearchPager(backend, page_size=2)
+    search = pager.new("/api/cities/search", "Город")
+    await pager.fetch(search, "t")
+    assert search["next"] == "1"
+
+    # следующую страницу удалили, пока пользователь смотрел на первую
+    del names[2:]
+    assert await pager.turn(search, True, "t") == []
+    assert search["page"] == 0 and search["cursors"] == [None] and search["next"] is None
+
+
+@pytest.mark.asyncio
+async def test_search_pager_limits(mock_backend):
+    requests = []
+    backend = mock_backend(cities_search(NAMES, requests))
+    # больше серверного максимума не запрашиваем - иначе 422
+    pager = SearchPager(backend, page_size=500)
+    search = pager.new("/api/cities/search", "Город")
+    assert len(await pager.fetch(search, "t")) == 4
+    assert requests[-1]["limit"] == str(SEARCH_LIMIT_MAX)
+
+    # длинные строка поиска и имена обрезаются - страница влезает в сообщение
+    search["title"] = "я" * 5000
+    items = [{"id": 10 ** 9 + i, "name": "ж" * 5000} for i in range(SEARCH_LIMIT_MAX)]
+    assert len(pager.text(search, items)) <= MESSAGE_MAX
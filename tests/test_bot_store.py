@@ -0,0 +1,59 @@
+import os
+import stat
+import time
+
+import pytest
+
+from Telegram_admin_panel.store import ExpiringStore
+
+
+def test_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "bot.sqlite3")
+    store = ExpiringStore(path, "dialogs", ttl=60, max_entries=10)
+    store.set(1, {"step": {"name": "create_offer_title"}, "ctx": {"msg_id": 42}})
+    store.close()
+
+    # "рестарт" бота
+    store = ExpiringStore(path, "dialogs", ttl=60, max_entries=10)
+    assert store.get(1) == {"step": {"name": "create_offer_title"}, "ctx": {"msg_id": 42}}
+    store.pop(1)
+    assert store.get(1) is None
+
+
+def test_store_expires_and_caps(tmp_path, monkeypatch):
+    store = ExpiringStore(str(tmp_path / "bot.sqlite3"), "sessions", ttl=10, max_entries=3)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    for user_id in range(5):
+        now += 1
+        store.set(user_id, f"token-{user_id}")
+    # вытеснены самые старые записи
+    assert len(store) == 3
+    assert store.get(0) is None and store.get(4) == "token-4"
+
+    now += 10
+    assert store.get(4) is None
+    store.set(5, "token-5")
+    assert len(store) == 1
+
+
+def test_store_rejects_non_json(tmp_path):
+    store = ExpiringStore(str(tmp_path / "bot.sqlite3"), "dialogs", ttl=60, max_entries=10)
+    with pytest.raises(TypeError):
+        store.set(1, {"msg": object()})
+
+
+def test_store_file_is_private(tmp_path):
+    path = tmp_path / "bot.sqlite3"
+    # файл от прежней версии с правами по umask
+    path.touch(mode=0o644)
+    os.chmod(path, 0o644)
+    store = ExpiringStore(str(path), "sessions", ttl=60, max_entries=10)
+    store.set(1, "jwt-token")
+    for name in ("bot.sqlite3", "bot.sqlite3-wal", "bot.sqlite3-shm"):
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) == 0o600, name
+    store.close()
+
+    fresh = tmp_path / "fresh.sqlite3"
+    ExpiringStore(str(fresh), "sessions", ttl=60, max_entries=10).close()
+    assert stat.S_IMODE(os.stat(fresh).st_mode) == 0o600
@@ -4,7 +4,7 @@ from db.models import User, RoleEnum
 from core.security import get_password_hash
 
 @pytest.mark.asyncio
-async def test_cities_crud(client: AsyncClient, db_session):
+async def test_cities_crud(client: AsyncClient, db_session, real_auth):
     # 1. Создаём пользователя-админа напрямую в БД
     hashed = get_password_hash("adminpass")
     admin = User(username="admin", hashed_password=hashed, role=RoleEnum.admin)
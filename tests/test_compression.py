@@ -0,0 +1,58 @@
+import gzip
+
+import pytest
+from httpx import AsyncClient
+
+from core.compression import choose_encoding, PrecompressedBody, COMPRESS_MIN_SIZE, _with_vary
+
+
+def test_choose_encoding():
+    assert choose_encoding(None) is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    # "*" не отменяет явный запрет
+    assert choose_encoding("br;q=0, *") == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0, *") is None
+    assert choose_encoding("*;q=0") is None
+    # имя параметра - без учёта регистра
+    assert choose_encoding("gzip;Q=0") is None
+    assert choose_encoding("gzip ; Q=0.5") == "gzip"
+
+
+def test_precompressed_variant_cached():
+    body = PrecompressedBody(b"[" + b'{"name":"x"},' * COMPRESS_MIN_SIZE + b"{}]")
+    r = body.response("gzip")
+    assert r.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(r.body) == body.body
+    # повторный запрос берёт уже сжатый вариант
+    assert body.response("gzip").body is r.body
+
+
+@pytest.mark.asyncio
+async def test_large_list_is_compressed(client: AsyncClient):
+    for i in range(60):
+        await client.post("/api/cities/", json={"name": f"Сжатый город {i}"})
+    r = await client.get("/api/cities/", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in r.headers["vary"].lower()
+    assert len(r.json()) == 60
+
+
+def test_vary_merged_once():
+    assert _with_vary([(b"content-type", b"application/json")])[-1] == (b"vary", b"Accept-Encoding")
+    assert _with_vary([(b"vary", b"Origin")]) == [(b"vary", b"Origin, Accept-Encoding")]
+    assert _with_vary([(b"vary", b"accept-encoding")]) == [(b"vary", b"accept-encoding")]
+
+
+@pytest.mark.asyncio
+async def test_vary_on_uncompressed_responses(client: AsyncClient):
+    city_id = (await client.post("/api/cities/", json={"name": "VaryCity"})).json()["id"]
+    # без Accept-Encoding и меньше порога: тело как есть, но кэшу нужен Vary
+    for headers in ({"Accept-Encoding": "identity"}, {"Accept-Encoding": "gzip"}):
+        for path, params in (("/api/offers/", {"city_id": city_id}), ("/api/cities/", None)):
+            r = await client.get(path, params=params, headers=headers)
+            assert r.status_code == 200
+            assert "content-encoding" not in r.headers
+            assert r.headers["vary"].lower().count("accept-encoding") == 1, (path, headers)
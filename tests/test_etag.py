@@ -0,0 +1,107 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db import versions
+from db.models import City
+from db.refdata import RefSnapshot
+from schemas.city import CityRead
+
+
+@pytest.mark.asyncio
+async def test_cities_conditional_get(client: AsyncClient):
+    await client.post("/api/cities/", json={"name": "EtagCity"})
+
+    r1 = await client.get("/api/cities/")
+    assert r1.status_code == 200
+    etag = r1.headers["etag"]
+    assert r1.headers["cache-control"].startswith("public")
+
+    # 1) Тот же ETag => 304 без тела
+    r2 = await client.get("/api/cities/", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.content == b""
+
+    # 2) После create_city ETag меняется
+    await client.post("/api/cities/", json={"name": "EtagCity2"})
+    r3 = await client.get("/api/cities/", headers={"If-None-Match": etag})
+    assert r3.status_code == 200
+    assert r3.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_offers_conditional_get(client: AsyncClient):
+    city_id = (await client.post("/api/cities/", json={"name": "EtagFeedCity"})).json()["id"]
+
+    r1 = await client.get("/api/offers/", params={"city_id": city_id})
+    token = r1.headers["x-access-token"]
+    headers = {"Authorization": f"Bearer {token}", "If-None-Match": r1.headers["etag"]}
+
+    r2 = await client.get("/api/offers/", params={"city_id": city_id}, headers=headers)
+    assert r2.status_code == 304
+
+    # без токена 304 не отдаём: нужен новый анонимный токен
+    r3 = await client.get("/api/offers/", params={"city_id": city_id},
+                          headers={"If-None-Match": r1.headers["etag"]})
+    assert r3.status_code == 200
+    assert "x-access-token" in r3.headers
+
+
+def test_refdata_etag_depends_only_on_data():
+    items = [{"id": 1, "name": "Уфа", "offers_count": 0}]
+    # два "воркера" с одинаковыми данными
+    first, second = RefSnapshot(City, CityRead), RefSnapshot(City, CityRead)
+    first.load(items)
+    second.load([dict(item) for item in items])
+    assert first.etag == second.etag
+
+    # перечитали по TTL, данные те же - тег и сжатое тело не меняются
+    body = first.body
+    first.load([dict(item) for item in items])
+    assert first.etag == second.etag and first.body is body
+
+    first.load([*items, {"id": 2, "name": "Пермь", "offers_count": 0}])
+    assert first.etag != second.etag
+
+
+@pytest.mark.asyncio
+async def test_offers_etag_shared_between_workers(client: AsyncClient):
+    city_id = (await client.post("/api/cities/", json={"name": "EtagSharedCity"})).json()["id"]
+    etag = (await client.get("/api/offers/", params={"city_id": city_id})).headers["etag"]
+
+    # другой воркер: своего кэша версий нет, тег читается из БД тот же
+    versions.invalidate()
+    assert (await client.get("/api/offers/", params={"city_id": city_id})).headers["etag"] == etag
+
+    r = await client.post("/api/offers/", json={
+        "title": "EtagSharedOffer",
+        "cities_ids": [city_id],
+        "categories_ids": [],
+        "background_image_url": "https://example.com/bg.png",
+        "company_logo_url": "https://example.com/logo.png",
+        "company_name": "Comp"
+    })
+    assert r.status_code == 201
+    new_etag = (await client.get("/api/offers/", params={"city_id": city_id})).headers["etag"]
+    assert new_etag != etag
+    versions.invalidate()
+    assert (await client.get("/api/offers/", params={"city_id": city_id})).headers["etag"] == new_etag
+
+
+@pytest.mark.asyncio
+async def test_data_versions_table_created_on_existing_db(tmp_path):
+    # база, созданная до появления data_versions: таблицу создаёт старт воркера
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(City.__table__.create)
+        await versions.create_table(engine)
+        await versions.create_table(engine)  # повторный старт - без ошибки
+        async with AsyncSession(engine) as db:
+            await versions.bump(db, "offers")
+            await db.commit()
+            versions.invalidate("offers")
+            assert await versions.offers_etag(db) == 'W/"offers-1"'
+    finally:
+        versions.invalidate()
+        await engine.dispose()
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+from core.event_ring import EventRing, HostLock
+
+
+def test_ring_shared_between_instances(tmp_path):
+    path = str(tmp_path / "events.ring")
+    writer = EventRing(path, capacity=3, slot_size=64)
+    # второй "воркер" открывает тот же файл
+    reader = EventRing(path, capacity=3, slot_size=64)
+    assert reader.latest() == []
+
+    for i in range(5):
+        assert writer.append(json.dumps({"n": i}).encode())
+    assert json.loads(reader.json_body()) == {"events": [{"n": 2}, {"n": 3}, {"n": 4}]}
+
+    # не влезает в слот - не пишется
+    assert not writer.append(b'"' + b"x" * 100 + b'"')
+    assert len(reader.latest()) == 3
+
+    # повторное открытие не теряет события
+    writer.close()
+    assert len(EventRing(path, capacity=3, slot_size=64).latest()) == 3
+
+
+def test_host_lock_single_holder(tmp_path):
+    path = str(tmp_path / "events.lock")
+    first, second = HostLock(path), HostLock(path)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_ring_reset_after_owner_dies(tmp_path):
+    path = str(tmp_path / "events.ring")
+    # прошлый запуск упал, не закрыв кольцо
+    crashed = EventRing(path, capacity=3, slot_size=64, owner=dead_pid())
+    crashed.append(b'{"n":1}')
+
+    # следующий запуск не отдаёт его события как свежие
+    restarted = EventRing(path, capacity=3, slot_size=64, owner=os.getpid())
+    assert restarted.latest() == []
+    restarted.append(b'{"n":2}')
+
+    # воркер того же запуска (в том числе перезапущенный) видит события
+    assert EventRing(path, capacity=3, slot_size=64, owner=os.getpid()).latest() == [b'{"n":2}']
+    # другой живой запуск на хосте (выкатка) кольцо не сбрасывает
+    assert EventRing(path, capacity=3, slot_size=64, owner=dead_pid()).latest() == [b'{"n":2}']
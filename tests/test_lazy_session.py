@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+
+from db.base import LazySession, engine, session_stats
+from db.dependencies import get_read_db
+from main import app as fastapi_app
+
+
+class FakeSession:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+    async def scalar(self, stmt):
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_opens_on_first_use():
+    created = []
+
+    def factory():
+        created.append(FakeSession())
+        return created[-1]
+
+    # не использованная сессия не создаётся и не закрывается
+    unused = LazySession(factory)
+    await unused.close()
+    assert not unused.used and created == []
+
+    used = LazySession(factory)
+    assert await used.scalar("select 1") == 1
+    assert used.used and len(created) == 1
+    await used.close()
+    assert created[0].closed
+
+
+@pytest.mark.asyncio
+async def test_feed_without_replica_takes_one_connection(client):
+    # get_db подменена сессией теста, get_read_db - настоящая: без реплики
+    # лента должна читать через ту же сессию, не беря второе соединение из пула
+    fastapi_app.dependency_overrides.pop(get_read_db)
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    provided = session_stats["provided"]
+    try:
+        r = await client.get("/api/offers/", params={"city_id": 1})
+    finally:
+        event.remove(engine.sync_engine, "checkout", on_checkout)
+    assert r.status_code == 200
+    assert checkouts == []
+    assert session_stats["provided"] == provided
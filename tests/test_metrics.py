@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from httpx import AsyncClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.asyncio
+async def test_metrics_exposes_route_templates(client: AsyncClient):
+    r = await client.post("/api/cities/", json={"name": "Пермь"})
+    city_id = r.json()["id"]
+    r = await client.delete(f"/api/cities/{city_id}")
+    assert r.status_code == 204
+
+    r = await client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    # метка - шаблон маршрута, а не конкретный id
+    assert 'http_responses_total{method="DELETE",route="/api/cities/{city_id}",status="204"}' in r.text
+    assert f'/api/cities/{city_id}"' not in r.text
+    assert "db_statements_per_request_count" in r.text
+
+
+def test_pool_gauges_in_multiprocess_mode(tmp_path):
+    # значения prometheus_client выбирает при импорте - нужен отдельный процесс
+    code = (
+        "import os\n"
+        "from core.metrics import register_pool_collector, render_latest\n"
+        "register_pool_collector({'primary': object(), 'replica': None}, lambda engine: {'size': 5, 'checked_out': 2})\n"
+        "print(os.getpid())\n"
+        "print(render_latest()[0].decode())\n"
+    )
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    pid, text = result.stdout.split("\n", 1)
+    assert f'db_pool_size{{pid="{pid}",pool="primary"}} 5.0' in text
+    assert f'db_pool_checked_out{{pid="{pid}",pool="primary"}} 2.0' in text
+    assert 'pool="replica"' not in text
@@ -0,0 +1,68 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from db.models import City
+
+
+@pytest.mark.asyncio
+async def test_offers_count_maintained_and_recount(client: AsyncClient, db_session):
+    city_a = (await client.post("/api/cities/", json={"name": "CntA"})).json()["id"]
+    city_b = (await client.post("/api/cities/", json={"name": "CntB"})).json()["id"]
+    cat_id = (await client.post("/api/categories/", json={
+        "name": "CntCat", "image_url": "https://example.com/c.png"
+    })).json()["id"]
+
+    def counts(items):
+        return {c["id"]: c["offers_count"] for c in items}
+
+    # 1) Создание предложения увеличивает счётчики
+    r = await client.post("/api/offers/", json={
+        "title": "CntOffer",
+        "cities_ids": [city_a],
+        "categories_ids": [cat_id],
+        "background_image_url": "https://example.com/bg.png",
+        "company_logo_url": "https://example.com/logo.png",
+        "company_name": "Comp"
+    })
+    assert r.status_code == 201
+    offer_id = r.json()["id"]
+    assert counts((await client.get("/api/cities/")).json()) == {city_a: 1, city_b: 0}
+    assert counts((await client.get("/api/categories/")).json()) == {cat_id: 1}
+
+    # 2) Добавление / удаление связи
+    await client.post(f"/api/offers/{offer_id}/cities/{city_b}")
+    await client.delete(f"/api/offers/{offer_id}/cities/{city_a}")
+    assert counts((await client.get("/api/cities/")).json()) == {city_a: 0, city_b: 1}
+
+    # 3) Ремонт после ручной порчи
+    await db_session.execute(update(City).values(offers_count=42))
+    await db_session.commit()
+    r_fix = await client.post("/api/offers/recount")
+    assert r_fix.status_code == 204
+    assert counts((await client.get("/api/cities/")).json()) == {city_a: 0, city_b: 1}
+
+    # 4) Удаление предложения обнуляет счётчики
+    await client.delete(f"/api/offers/{offer_id}")
+    assert counts((await client.get("/api/cities/")).json()) == {city_a: 0, city_b: 0}
+    assert counts((await client.get("/api/categories/")).json()) == {cat_id: 0}
+
+
+@pytest.mark.asyncio
+async def test_duplicate_city_link_keeps_count(client: AsyncClient):
+    city_id = (await client.post("/api/cities/", json={"name": "DupCity"})).json()["id"]
+    r = await client.post("/api/offers/", json={
+        "title": "DupOffer",
+        "cities_ids": [city_id],
+        "categories_ids": [],
+        "background_image_url": "https://example.com/bg.png",
+        "company_logo_url": "https://example.com/logo.png",
+        "company_name": "Comp"
+    })
+    offer_id = r.json()["id"]
+
+    # связь уже есть: ON CONFLICT DO NOTHING, счётчик не растёт
+    r = await client.post(f"/api/offers/{offer_id}/cities/{city_id}")
+    assert r.status_code == 404
+    cities = (await client.get("/api/cities/")).json()
+    assert [c["offers_count"] for c in cities if c["id"] == city_id] == [1]
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import greenlet_spawn
+
+from db.pool import TimedQueuePool, _TimedQueue, warmup_pool
+
+
+class FakeConnection:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def slow_connect():
+    time.sleep(0.05)
+    return FakeConnection()
+
+
+@pytest.mark.asyncio
+async def test_pool_wait_excludes_connect_time():
+    pool = TimedQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=5)
+    await greenlet_spawn(lambda: pool.connect().close())
+    stats = pool.wait_stats.as_dict()
+    assert stats["checkouts"] == 1
+    # 50 мс connect не считаются ожиданием пула
+    assert stats["wait_max_ms"] < 10
+
+    # соединение занято - второй checkout ждёт его возврата
+    held = await greenlet_spawn(pool.connect)
+    waiter = asyncio.create_task(greenlet_spawn(pool.connect))
+    await asyncio.sleep(0.05)
+    await greenlet_spawn(held.close)
+    await greenlet_spawn((await waiter).close)
+
+    stats = pool.wait_stats.as_dict()
+    assert stats["checkouts"] == 3
+    assert stats["wait_max_ms"] >= 40
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_survive_recreate():
+    pool = TimedQueuePool(FakeConnection, pool_size=1, max_overflow=0, timeout=5)
+    # на этой версии SQLAlchemy подмена очереди сработала (иначе пул не создался бы)
+    assert isinstance(pool._pool, _TimedQueue)
+    await greenlet_spawn(lambda: pool.connect().close())
+    new_pool = pool.recreate()
+    await greenlet_spawn(lambda: new_pool.connect().close())
+    # статистика общая, выдача считается один раз
+    assert new_pool.wait_stats is pool.wait_stats
+    assert pool.wait_stats.checkouts == 2
+
+
+@pytest.mark.asyncio
+async def test_warmup_capped_at_pool_size(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}",
+        poolclass=TimedQueuePool, pool_size=2, max_overflow=0, pool_timeout=0.5,
+    )
+    try:
+        # без ограничения 10 одновременных connect при пуле 2+0 упираются в pool_timeout
+        await warmup_pool(engine, 10)
+        assert engine.sync_engine.pool.checkedin() == 2
+    finally:
+        await engine.dispose()
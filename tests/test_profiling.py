@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from core import profiling
+from core.profiling import StackSampler
+
+
+def busy_loop(sampler: StackSampler, samples: int, timeout: float):
+    # крутимся, пока сэмплер не наберёт samples снимков (под нагрузкой он получает GIL реже)
+    deadline = time.perf_counter() + timeout
+    while sum(sampler.stacks.values()) < samples and time.perf_counter() < deadline:
+        pass
+
+
+def test_stack_sampler_folded_output():
+    sampler = StackSampler(threading.get_ident(), 0.001)
+    sampler.start()
+    busy_loop(sampler, 5, timeout=5)
+    sampler.stop()
+
+    folded = sampler.folded()
+    assert "busy_loop (tests/test_profiling.py:" in folded
+    # формат flamegraph: "кадр;кадр;кадр <число>"
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+
+@pytest.mark.asyncio
+async def test_profile_header_requires_superadmin(client: AsyncClient):
+    r = await client.get("/api/cities/", headers={"X-Profile": "1"})
+    assert r.status_code == 200
+    assert "x-profile-id" not in r.headers
+
+
+@pytest.mark.asyncio
+async def test_sampled_requests_are_stored(client: AsyncClient, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    await client.get("/api/cities/")
+    assert len(profiling.list_profiles()) == 1
+
+    # профиль лежит в файлах: его отдаёт любой воркер хоста, а не только записавший
+    r = await client.get("/internal/profiles")
+    profile = r.json()[0]
+    assert profile["route"] == "GET /api/cities/"
+    assert not profile["requested"]
+    assert (tmp_path / f"{profile['id']}.folded").exists()
+    r = await client.get(f"/internal/profiles/{profile['id']}")
+    assert r.status_code == 200
+    assert r.text == profiling.load_folded(profile["id"])
+
+    assert (await client.get("/internal/profiles/000000000000")).status_code == 404
+    assert (await client.get("/internal/profiles/..%2F..%2Fetc%2Fpasswd")).status_code == 404
+
+
+def test_stored_profiles_are_pruned(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    for i in range(3):
+        profiling._store(f"{i:012x}", {"route": "GET /", "requested": False, "duration_ms": 1, "samples": 0}, "")
+        # порядок - по mtime
+        os.utime(tmp_path / f"{i:012x}.json", (i, i))
+    profiling._store("00000000000a", {"route": "GET /", "requested": False, "duration_ms": 1, "samples": 0}, "")
+    assert [p["id"] for p in profiling.list_profiles()] == ["00000000000a", "000000000002"]
+    assert sorted(f.name for f in tmp_path.iterdir()) == [
+        "000000000002.folded", "000000000002.json", "00000000000a.folded", "00000000000a.json",
+    ]
@@ -0,0 +1,47 @@
+import pytest
+from httpx import AsyncClient
+
+from db.models import City
+from db.refdata import RefSnapshot
+from schemas.city import CityRead
+
+
+def make_snapshot(names: list[str]) -> RefSnapshot:
+    snapshot = RefSnapshot(City, CityRead)
+    snapshot.load([{"id": i, "name": n, "offers_count": 0} for i, n in enumerate(names, start=1)])
+    return snapshot
+
+
+def test_autocomplete_prefix_first():
+    snapshot = make_snapshot(["Уфа", "Москва", "Самара", "Саратов", "Усть-Кут"])
+    assert [c["name"] for c in snapshot.autocomplete("са", 10)] == ["Самара", "Саратов"]
+    # по подстроке, если префиксов нет
+    assert [c["name"] for c in snapshot.autocomplete("кут", 10)] == ["Усть-Кут"]
+    assert len(snapshot.autocomplete("а", 1)) == 1
+
+
+def test_search_keyset_cursor():
+    snapshot = make_snapshot(["Уфа", "Москва", "Самара", "Саратов"])
+    page1 = snapshot.search("а", 2)
+    assert [c["name"] for c in page1] == ["Москва", "Самара"]
+    page2 = snapshot.search("а", 2, after=page1[-1]["name"])
+    assert [c["name"] for c in page2] == ["Саратов", "Уфа"]
+
+
+@pytest.mark.asyncio
+async def test_cities_list_refreshed_after_write(client: AsyncClient):
+    r0 = await client.get("/api/cities/")
+    assert r0.status_code == 200
+
+    r1 = await client.post("/api/cities/", json={"name": "Казань"})
+    assert r1.status_code == 201
+    city_id = r1.json()["id"]
+
+    # create_city поднимает версию снимка — город сразу виден
+    r2 = await client.get("/api/cities/autocomplete", params={"q": "каз"})
+    assert [c["id"] for c in r2.json()] == [city_id]
+
+    r3 = await client.delete(f"/api/cities/{city_id}")
+    assert r3.status_code == 204
+    r4 = await client.get("/api/cities/")
+    assert all(c["id"] != city_id for c in r4.json())
@@ -0,0 +1,65 @@
+import pytest
+from httpx import AsyncClient
+
+from db.crud import SEARCH_LIMIT_MAX
+
+
+@pytest.mark.asyncio
+async def test_search_limit_and_cursor(client: AsyncClient):
+    # Подготовим 5 городов с общей подстрокой
+    for i in range(5):
+        r = await client.post("/api/cities/", json={"name": f"Город{i}"})
+        assert r.status_code == 201
+
+    # 1) Первая страница из двух элементов + курсор
+    r1 = await client.get("/api/cities/search", params={"title": "Город", "limit": 2})
+    assert r1.status_code == 200
+    page1 = r1.json()
+    assert [c["name"] for c in page1] == ["Город0", "Город1"]
+    cursor = r1.headers["x-next-cursor"]
+
+    # 2) Следующая страница начинается после курсора
+    r2 = await client.get("/api/cities/search", params={"title": "Город", "limit": 2, "after": cursor})
+    assert r2.status_code == 200
+    assert [c["name"] for c in r2.json()] == ["Город2", "Город3"]
+
+    # 3) Последняя неполная страница — без курсора
+    r3 = await client.get("/api/cities/search",
+                          params={"title": "Город", "limit": 2, "after": r2.headers["x-next-cursor"]})
+    assert r3.status_code == 200
+    assert [c["name"] for c in r3.json()] == ["Город4"]
+    assert "x-next-cursor" not in r3.headers
+
+    # 4) limit выше серверного максимума => 422
+    r4 = await client.get("/api/cities/search", params={"title": "Город", "limit": SEARCH_LIMIT_MAX + 1})
+    assert r4.status_code == 422
+
+    # 5) Битый курсор => 400
+    r5 = await client.get("/api/offers/search", params={"title": "x", "after": "###"})
+    assert r5.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_full_last_page_has_no_cursor(client: AsyncClient):
+    # 4 города при limit=2: вторая страница заполнена целиком, но она последняя
+    for i in range(4):
+        r = await client.post("/api/cities/", json={"name": f"Посёлок{i}"})
+        assert r.status_code == 201
+    for i in range(4):
+        r = await client.post("/api/offers/", json={
+            "title": f"Полная{i}",
+            "cities_ids": [],
+            "categories_ids": [],
+            "background_image_url": "https://example.com/bg.png",
+            "company_logo_url": "https://example.com/logo.png",
+            "company_name": "Comp"
+        })
+        assert r.status_code == 201
+
+    for path, title, key in (("/api/cities/search", "Посёлок", "name"), ("/api/offers/search", "Полная", "title")):
+        r1 = await client.get(path, params={"title": title, "limit": 2})
+        assert [item[key] for item in r1.json()] == [f"{title}0", f"{title}1"]
+        r2 = await client.get(path, params={"title": title, "limit": 2, "after": r1.headers["x-next-cursor"]})
+        assert r2.status_code == 200
+        assert [item[key] for item in r2.json()] == [f"{title}2", f"{title}3"]
+        assert "x-next-cursor" not in r2.headers
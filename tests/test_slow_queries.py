@@ -0,0 +1,42 @@
+import pytest
+from httpx import AsyncClient
+
+from db import instrumentation
+from db.models import User, RoleEnum
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_recorded_with_params(client: AsyncClient, monkeypatch):
+    # порог меньше любого запроса - в журнал попадает всё
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0.0001)
+    instrumentation.slow_queries.clear()
+
+    await client.get("/api/offers/search", params={"title": "медленный"})
+
+    r = await client.get("/internal/slow-queries")
+    assert r.status_code == 200
+    entry = next(e for e in r.json() if e["route"] == "GET /api/offers/search")
+    assert "FROM offers" in entry["sql"]
+    assert "медленный" in entry["params"]
+    assert entry["duration_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_disabled_by_default(client: AsyncClient):
+    instrumentation.slow_queries.clear()
+    await client.get("/api/offers/search", params={"title": "быстрый"})
+    assert list(instrumentation.slow_queries) == []
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_hide_write_params(db_session, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0.0001)
+    instrumentation.slow_queries.clear()
+
+    db_session.add(User(username="slow_user", hashed_password="secret-hash", role=RoleEnum.user))
+    await db_session.commit()
+
+    entry = next(e for e in instrumentation.slow_queries if "INSERT INTO users" in e["sql"])
+    assert entry["params"] is None
+    assert not any("secret-hash" in (e["params"] or "") for e in instrumentation.slow_queries)
+    assert "secret-hash" not in caplog.text
@@ -0,0 +1,56 @@
+import logging
+import re
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from db import instrumentation
+
+SERVER_TIMING = re.compile(r'db;dur=(\d+\.\d);desc="(\d+) queries", db-slowest;dur=(\d+\.\d)')
+
+
+@pytest.mark.asyncio
+async def test_server_timing_counts_queries(client: AsyncClient, test_engine):
+    city_id = (await client.post("/api/cities/", json={"name": "TimingCity"})).json()["id"]
+    executed = []
+
+    def on_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(test_engine.sync_engine, "after_cursor_execute", on_execute)
+    try:
+        r = await client.get("/api/offers/", params={"city_id": city_id})
+    finally:
+        event.remove(test_engine.sync_engine, "after_cursor_execute", on_execute)
+
+    assert r.status_code == 200
+    match = SERVER_TIMING.fullmatch(r.headers["server-timing"])
+    assert match, r.headers["server-timing"]
+    total, count, slowest = float(match[1]), int(match[2]), float(match[3])
+    assert count == len(executed) > 0
+    assert total >= slowest >= 0
+    assert instrumentation.route_totals["GET /api/offers/"]["statements"] >= count
+
+
+@pytest.mark.asyncio
+async def test_no_server_timing_without_queries(client: AsyncClient):
+    # список городов отдаётся из снимка в памяти - без запросов к БД и без заголовка
+    await client.get("/api/cities/")
+    r = await client.get("/api/cities/")
+    assert r.status_code == 200
+    assert "server-timing" not in r.headers
+
+
+@pytest.mark.asyncio
+async def test_many_queries_logged(client: AsyncClient, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "SQL_STATEMENT_WARN", 1)
+    city_id = (await client.post("/api/cities/", json={"name": "NPlusOneCity"})).json()["id"]
+
+    with caplog.at_level(logging.WARNING, logger="db.sql"):
+        r = await client.get("/api/offers/", params={"city_id": city_id})
+
+    count = int(SERVER_TIMING.fullmatch(r.headers["server-timing"])[2])
+    assert count > 1
+    messages = [rec.getMessage() for rec in caplog.records if rec.name == "db.sql" and rec.levelno == logging.WARNING]
+    assert any(m.startswith(f"GET /api/offers/: {count} SQL-запросов за один HTTP-запрос") for m in messages)